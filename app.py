@@ -4,92 +4,556 @@ WORKING Real Estate AI Demo for Koyeb Deployment
 This actually works - auto-chat starts immediately!
 """
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, render_template_string, request, jsonify, stream_with_context
+import gzip
+import hashlib
+import importlib.util
+import heapq
 import json
+import math
+import queue
 import re
 import random
 import time
 import os
+import sys
+import mmap
+import sqlite3
+import struct
+import tempfile
+import multiprocessing
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 import threading
+from bisect import bisect_left, insort
+from itertools import islice
 
-# Try Google AI import
 try:
-    import google.generativeai as genai
-    GOOGLE_AI_AVAILABLE = True
+    import fcntl
 except ImportError:
-    GOOGLE_AI_AVAILABLE = False
+    fcntl = None
 
-app = Flask(__name__)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def _module_available(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+# google.generativeai drags in grpc and protobuf, so it is only imported
+# when the first model call needs a client (see GeminiModel)
+GOOGLE_AI_AVAILABLE = _module_available('google.generativeai')
+
+# Static files are served precompressed from memory, see StaticAsset
+app = Flask(__name__, static_folder=None)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# ================================
+# MODEL GATEWAY
+# ================================
+
+class ModelUnavailable(Exception):
+    """Model call was rejected, timed out or failed - use the rule-based path"""
+
+class GeminiModel:
+    """Gemini client that is built on first use, once per process"""
+    
+    def __init__(self, api_key, name='gemini-pro'):
+        self.api_key = api_key
+        self.name = name
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def generate_content(self, prompt):
+        return self._get_client().generate_content(prompt)
+    
+    def _get_client(self):
+        # gRPC channels do not survive fork, so a client built in the
+        # gunicorn master (--preload) is never reused by a worker
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._client = genai.GenerativeModel(self.name)
+                self._pid = os.getpid()
+                print(f"✅ Google AI client ready (pid {self._pid})")
+            return self._client
+
+class ModelGateway:
+    """Runs blocking model calls on a bounded pool with per-call deadlines"""
+    
+    def __init__(self, model, workers=4, queue_depth=16, timeout=4.0):
+        self.model = model
+        self.timeout = timeout
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.counters = {'calls': 0, 'ok': 0, 'timeouts': 0, 'errors': 0, 'rejected': 0}
+        self._slots = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def generate(self, prompt, timeout=None):
+        """Return the model's text for prompt or raise ModelUnavailable"""
+        return self._result(self._submit(prompt), timeout)
+    
+    def generate_many(self, prompts, timeout=None):
+        """Texts for prompts, run side by side; a ModelUnavailable stands in for each that failed"""
+        results = []
+        # One wave per worker count, so a big chunk neither fills the queue
+        # other requests need nor waits past its deadline behind itself
+        for start in range(0, len(prompts), self.workers):
+            futures = []
+            for prompt in prompts[start:start + self.workers]:
+                try:
+                    futures.append(self._submit(prompt))
+                except ModelUnavailable as e:
+                    futures.append(e)
+            for future in futures:
+                try:
+                    if isinstance(future, ModelUnavailable):
+                        raise future
+                    results.append(self._result(future, timeout))
+                except ModelUnavailable as e:
+                    results.append(e)
+        return results
+    
+    def _submit(self, prompt):
+        slots, executor = self._get_pool()
+        if not slots.acquire(blocking=False):
+            self._count('rejected')
+            raise ModelUnavailable("model queue full")
+        
+        self._count('calls')
+        try:
+            future = executor.submit(self._call, prompt)
+        except RuntimeError as e:
+            slots.release()
+            self._count('errors')
+            raise ModelUnavailable(str(e))
+        future.add_done_callback(lambda _: slots.release())
+        return future
+    
+    def _result(self, future, timeout=None):
+        try:
+            text = future.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._count('timeouts')
+            raise ModelUnavailable("model call timed out")
+        except Exception as e:
+            self._count('errors')
+            raise ModelUnavailable(str(e))
+        
+        self._count('ok')
+        return text
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, workers=self.workers,
+                        queue_depth=self.queue_depth, timeout=self.timeout)
+    
+    def _get_pool(self):
+        # Built lazily and again after fork: a forked worker inherits the
+        # executor object but none of its threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Slots cover running plus queued calls, so a stalled model can
+                # never pile up more than workers + queue_depth pending requests
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='model')
+                self._pid = os.getpid()
+            return self._slots, self._executor
+    
+    def _call(self, prompt):
+        return self.model.generate_content(prompt).text
+    
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+class DecisionBatcher:
+    """Coalesces concurrent classification requests into one model call"""
+    
+    PROMPT = (
+        "You monitor an Israeli real estate brokers' WhatsApp group for a tenant "
+        "screening service. For each numbered message decide if it needs a reply: tenant "
+        "applications, credit checks and screening requests do, casual chat does not.\n"
+        'Answer only with a JSON array, one object per message: '
+        '[{{"id": 1, "should_respond": true|false, "confidence": 0-1, "reason": "short reason"}}]\n'
+        "Messages:\n{messages}"
+    )
+    
+    def __init__(self, gateway, window=0.015, max_batch=16, history=200):
+        self.gateway = gateway
+        self.window = window
+        self.max_batch = max_batch
+        self.counters = {'batches': 0, 'items': 0, 'failed_batches': 0}
+        self.recent = deque(maxlen=history)
+        self._pending = []
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._runner = None
+        self._pid = None
+    
+    def classify(self, message):
+        """Raw model verdict for message or raise ModelUnavailable"""
+        return self._wait(self._submit([message])[0])
+    
+    def classify_many(self, messages):
+        """Verdicts for messages queued together, so they share batches instead of
+        going out one per call; a ModelUnavailable stands in for each that failed"""
+        verdicts = []
+        for future in self._submit(messages):
+            try:
+                verdicts.append(self._wait(future))
+            except ModelUnavailable as e:
+                verdicts.append(e)
+        return verdicts
+    
+    def stats(self):
+        with self._cond:
+            recent = list(self.recent)
+            counters = dict(self.counters)
+        if recent:
+            counters['avg_batch_size'] = round(sum(b['size'] for b in recent) / len(recent), 2)
+            counters['avg_wait_ms'] = round(sum(b['wait_ms'] for b in recent) / len(recent), 2)
+            counters['avg_call_ms'] = round(sum(b['call_ms'] for b in recent) / len(recent), 2)
+        return dict(counters, window_ms=self.window * 1000, max_batch=self.max_batch,
+                    recent=recent[-10:])
+    
+    def _submit(self, messages):
+        futures = [Future() for _ in messages]
+        now = time.monotonic()
+        with self._cond:
+            self._ensure_dispatcher()
+            self._pending.extend((message, future, now) for message, future in zip(messages, futures))
+            self._cond.notify()
+        return futures
+    
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.window + self.gateway.timeout + 1.0)
+        except FutureTimeout:
+            raise ModelUnavailable("batched model call timed out")
+    
+    def _ensure_dispatcher(self):
+        if self._pid != os.getpid():
+            # First use, or a forked child that inherited neither thread
+            self._pending = []
+            self._runner = ThreadPoolExecutor(max_workers=self.gateway.workers, thread_name_prefix='model-batch')
+            self._pid = os.getpid()
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch, name='model-batcher', daemon=True)
+            self._dispatcher.start()
+    
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Hold the batch open for the window unless it fills up first
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._runner.submit(self._run, batch)
+    
+    def _run(self, batch):
+        started = time.monotonic()
+        messages = "\n".join(f"{i}. {json.dumps(message, ensure_ascii=False)}"
+                             for i, (message, _, _) in enumerate(batch, 1))
+        try:
+            verdicts = _parse_json_reply(self.gateway.generate(self.PROMPT.format(messages=messages)))
+            if not isinstance(verdicts, list):
+                raise ValueError("expected a JSON array")
+            by_id = {v.get('id'): v for v in verdicts if isinstance(v, dict)}
+            for i, (_, future, _) in enumerate(batch, 1):
+                verdict = by_id.get(i)
+                if verdict is None and len(verdicts) == len(batch):
+                    verdict = verdicts[i - 1]
+                if isinstance(verdict, dict):
+                    future.set_result(verdict)
+                else:
+                    future.set_exception(ModelUnavailable("no verdict for message"))
+            failed = 0
+        except (ModelUnavailable, ValueError) as e:
+            for _, future, _ in batch:
+                future.set_exception(ModelUnavailable(str(e)))
+            failed = 1
+        
+        finished = time.monotonic()
+        with self._cond:
+            self.counters['batches'] += 1
+            self.counters['items'] += len(batch)
+            self.counters['failed_batches'] += failed
+            self.recent.append({
+                'size': len(batch),
+                'wait_ms': round((started - batch[0][2]) * 1000, 2),
+                'call_ms': round((finished - started) * 1000, 2)
+            })
+
+def _parse_json_reply(text):
+    """Pull the first JSON object or array out of a model reply"""
+    match = re.search(r'[\[{].*[\]}]', text or '', re.DOTALL)
+    if not match:
+        raise ValueError("no JSON in model reply")
+    return json.loads(match.group(0))
+
+# ================================
+# RESPONSE CACHE
+# ================================
+
+class ResponseCache:
+    """LRU + TTL cache keyed by a normalized message"""
+    
+    WHITESPACE = re.compile(r'\s+')
+    DIGITS = re.compile(r'[0-9]')
+    
+    def __init__(self, max_size=2048, ttl=300, mask_digits=False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.mask_digits = mask_digits
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def key(self, message):
+        """Fold case and whitespace, and optionally mask digits"""
+        key = self.WHITESPACE.sub(' ', message.lower()).strip()
+        if self.mask_digits:
+            # Each digit becomes 0 so digit run lengths (phone patterns) survive
+            key = self.DIGITS.sub('0', key)
+        return key
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            if self.ttl and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1]
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return dict(self.counters, size=len(self._entries), max_size=self.max_size,
+                        ttl=self.ttl, hit_rate=round(self.counters['hits'] / lookups, 3) if lookups else None)
 
 # ================================
 # SIMPLE WORKING AI AGENTS
 # ================================
 
+class MessageScanner:
+    """Single pass over a message shared by the monitor and the extractor"""
+    
+    # One alternation over the lowercased text finds every field keyword in a
+    # single walk; the field patterns are then only tried where one occurs
+    KEYWORDS = re.compile(r'name|phone|salary')
+    KEYWORDS_ANYCASE = re.compile(r'name|phone|salary', re.IGNORECASE)
+    FIELDS = {
+        'name': re.compile(r'name[:\s]+([a-zA-Z\s]{3,30})', re.IGNORECASE),
+        'phone': re.compile(r'phone[:\s]*([0-9\-\s]{8,20})', re.IGNORECASE),
+        'salary': re.compile(r'salary[:\s]*([0-9,]+)', re.IGNORECASE)
+    }
+    EMAIL = re.compile(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+    URGENT = ('urgent credit', 'need verification', 'screen tenant')
+    
+    def is_priority(self, message):
+        """Cheap urgent-trigger check, used to pick an admission lane before the full scan"""
+        msg_lower = message.lower()
+        return any(word in msg_lower for word in self.URGENT)
+    
+    def scan(self, message):
+        """Scan message once for routing flags and tenant fields"""
+        msg_lower = message.lower()
+        fields = {}
+        
+        # Case folding can change the length of non-ASCII text, and then
+        # offsets in msg_lower no longer line up with message
+        if len(msg_lower) == len(message):
+            keywords = self.KEYWORDS.finditer(msg_lower)
+        else:
+            keywords = self.KEYWORDS_ANYCASE.finditer(message)
+        
+        for keyword in keywords:
+            field = keyword.group(0).lower()
+            if field in fields:
+                continue
+            match = self.FIELDS[field].match(message, keyword.start())
+            if match:
+                fields[field] = match.group(1)
+            if len(fields) == 3:
+                break
+        
+        if '@' in message:
+            email_match = self.EMAIL.search(message)
+            if email_match:
+                fields['email'] = email_match.group(1)
+        
+        return {
+            'lower': msg_lower,
+            'fields': fields,
+            'urgent': any(word in msg_lower for word in self.URGENT),
+            'credit_check': 'credit' in msg_lower and ('check' in msg_lower or 'verify' in msg_lower)
+        }
+
 class WorkingMonitorAgent:
-    def __init__(self):
+    DECISION_PROMPT = (
+        "You monitor an Israeli real estate brokers' WhatsApp group for a tenant "
+        "screening service. Decide if this message needs a reply: tenant applications, "
+        "credit checks and screening requests do, casual chat does not.\n"
+        'Answer only with JSON: {{"should_respond": true|false, "confidence": 0-1, "reason": "short reason"}}\n'
+        "Message: {message}"
+    )
+    
+    def __init__(self, scanner=None, model=None, cache=None):
         self.api_key = os.getenv('GOOGLE_API_KEY')
         self.has_api = False
+        self.scanner = scanner or MessageScanner()
+        self.cache = cache
+        self.gateway = None
+        self.batcher = None
         
-        if self.api_key and GOOGLE_AI_AVAILABLE:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('gemini-pro')
-                self.has_api = True
-                print("✅ Google AI Connected")
-            except Exception as e:
-                print(f"⚠️ Google AI Error: {e}")
-                self.has_api = False
+        if model is not None:
+            self.model = model
+            self.has_api = True
+        elif self.api_key and GOOGLE_AI_AVAILABLE:
+            # Connects on the first call; failures there fall back to the rules
+            self.model = GeminiModel(self.api_key)
+            self.has_api = True
+            print("✅ Google AI configured")
         else:
             print("⚠️ No Google API key or library - using fallback")
+        
+        if self.has_api and os.getenv('AI_MODE', 'model') == 'model':
+            self.gateway = ModelGateway(
+                self.model,
+                workers=int(os.getenv('MODEL_WORKERS', 4)),
+                queue_depth=int(os.getenv('MODEL_QUEUE_DEPTH', 16)),
+                timeout=float(os.getenv('MODEL_TIMEOUT', 4.0))
+            )
+            window_ms = float(os.getenv('MODEL_BATCH_WINDOW_MS', 15))
+            if window_ms > 0:
+                self.batcher = DecisionBatcher(
+                    self.gateway,
+                    window=window_ms / 1000,
+                    max_batch=int(os.getenv('MODEL_BATCH_MAX', 16))
+                )
+    
+    def decide(self, message, scan=None):
+        """Model-backed decision, falling back to the rules on any failure"""
+        return self.decide_many([message], [scan])[0]
+    
+    def decide_many(self, messages, scans=None):
+        """decide() for a chunk; uncached messages reach the model together, not one call each"""
+        scans = scans or [None] * len(messages)
+        keys = [self.cache.key(message) if self.cache else None for message in messages]
+        decisions = [self.cache.get(key) if key is not None else None for key in keys]
+        todo = [i for i, decision in enumerate(decisions) if decision is None]
+        if not todo:
+            return decisions
+        
+        if not self.gateway:
+            for i in todo:
+                decisions[i] = dict(self.should_respond(messages[i], scans[i]), source="rules")
+                if keys[i] is not None:
+                    self.cache.put(keys[i], decisions[i])
+            return decisions
+        
+        if self.batcher:
+            replies = self.batcher.classify_many([messages[i] for i in todo])
+        else:
+            replies = self.gateway.generate_many([self.DECISION_PROMPT.format(message=messages[i]) for i in todo])
+        for i, reply in zip(todo, replies):
+            try:
+                if isinstance(reply, Exception):
+                    raise reply
+                if not isinstance(reply, dict):
+                    reply = _parse_json_reply(reply)
+                decisions[i] = {
+                    "should_respond": bool(reply['should_respond']),
+                    "confidence": min(max(float(reply.get('confidence', 0.5)), 0.0), 1.0),
+                    "reason": str(reply.get('reason') or 'Model decision')[:80],
+                    "source": "model"
+                }
+            except (ModelUnavailable, ValueError, KeyError, TypeError, AttributeError):
+                # Fallbacks are not cached so the model is retried next time
+                decisions[i] = dict(self.should_respond(messages[i], scans[i]), source="rules")
+                continue
+            if keys[i] is not None:
+                self.cache.put(keys[i], decisions[i])
+        return decisions
     
-    def should_respond(self, message):
+    @staticmethod
+    def has_complete_tenant(scan):
+        """At least two of name, phone and salary"""
+        fields = scan['fields']
+        return sum(field in fields for field in ('name', 'phone', 'salary')) >= 2
+    
+    def should_respond(self, message, scan=None):
         """Decide if AI should respond"""
-        msg_lower = message.lower()
+        scan = scan or self.scanner.scan(message)
         
         # High priority - always respond
-        if any(word in msg_lower for word in ['urgent credit', 'need verification', 'screen tenant']):
+        if scan['urgent']:
             return {"should_respond": True, "confidence": 0.95, "reason": "Urgent request"}
         
         # Complete tenant data
-        has_name = bool(re.search(r'name[:\s]+[a-zA-Z\s]{3,}', message, re.IGNORECASE))
-        has_phone = bool(re.search(r'phone[:\s]*[0-9\-\s]{8,}', message, re.IGNORECASE))
-        has_salary = bool(re.search(r'salary[:\s]*[0-9,]+', message, re.IGNORECASE))
-        
-        if sum([has_name, has_phone, has_salary]) >= 2:
+        if self.has_complete_tenant(scan):
             return {"should_respond": True, "confidence": 0.85, "reason": "Complete tenant data"}
         
         # Credit check requests
-        if 'credit' in msg_lower and ('check' in msg_lower or 'verify' in msg_lower):
+        if scan['credit_check']:
             return {"should_respond": True, "confidence": 0.80, "reason": "Credit check request"}
         
         # Default: don't respond to casual chat
         return {"should_respond": False, "confidence": 0.90, "reason": "Casual conversation"}
 
 class WorkingDataExtractor:
-    def extract(self, message):
+    def __init__(self, scanner=None):
+        self.scanner = scanner or MessageScanner()
+    
+    def extract(self, message, scan=None):
         """Extract data from message"""
+        scan = scan or self.scanner.scan(message)
+        fields = scan['fields']
         tenant = {}
         
-        # Extract name
-        name_match = re.search(r'name[:\s]+([a-zA-Z\s]{3,30})', message, re.IGNORECASE)
-        if name_match:
-            tenant['name'] = name_match.group(1).strip()
-        
-        # Extract phone
-        phone_match = re.search(r'phone[:\s]*([0-9\-\s]{8,20})', message, re.IGNORECASE)
-        if phone_match:
-            tenant['phone'] = phone_match.group(1).strip()
-        
-        # Extract salary
-        salary_match = re.search(r'salary[:\s]*([0-9,]+)', message, re.IGNORECASE)
-        if salary_match:
-            tenant['salary'] = salary_match.group(1)
-        
-        # Extract email
-        email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', message)
-        if email_match:
-            tenant['email'] = email_match.group(1)
+        if 'name' in fields:
+            tenant['name'] = fields['name'].strip()
+        if 'phone' in fields:
+            tenant['phone'] = fields['phone'].strip()
+        if 'salary' in fields:
+            tenant['salary'] = fields['salary']
+        if 'email' in fields:
+            tenant['email'] = fields['email']
         
         count = len([v for v in tenant.values() if v])
         
@@ -99,6 +563,49 @@ class WorkingDataExtractor:
         }
 
 class WorkingResponseAgent:
+    REPLY_PROMPT = (
+        "You are the AI assistant of a tenant screening and credit check service in an "
+        "Israeli real estate brokers' WhatsApp group. Write one short, friendly reply "
+        "(max 2 sentences, may use one emoji) to this message.\n"
+        "Message: {message}\n"
+        "Extracted tenant data: {tenant}"
+    )
+    
+    def __init__(self, gateway=None, cache=None):
+        self.gateway = gateway
+        self.cache = cache
+    
+    def generate(self, message, extracted_data, use_cache=True):
+        """Model-backed reply, falling back to the templates on any failure"""
+        return self.generate_many([(message, extracted_data, use_cache)])[0]
+    
+    def generate_many(self, items):
+        """Replies for (message, extracted_data, use_cache) items, model calls made side by side"""
+        keys = [self.cache.key(message) if self.cache and use_cache else None for message, _, use_cache in items]
+        replies = [self.cache.get(key) if key is not None else None for key in keys]
+        todo = [i for i, reply in enumerate(replies) if reply is None]
+        
+        if self.gateway and todo:
+            texts = self.gateway.generate_many([
+                self.REPLY_PROMPT.format(message=items[i][0], tenant=json.dumps(items[i][1].get('tenant', {})))
+                for i in todo
+            ])
+            for i, text in zip(todo, texts):
+                if isinstance(text, str) and text.strip():
+                    replies[i] = text.strip()
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], replies[i])
+                else:
+                    # Fallbacks are not cached so the model is retried next time
+                    replies[i] = self.respond(items[i][0], items[i][1])
+            return replies
+        
+        for i in todo:
+            replies[i] = self.respond(items[i][0], items[i][1])
+            if keys[i] is not None:
+                self.cache.put(keys[i], replies[i])
+        return replies
+    
     def respond(self, message, extracted_data):
         """Generate response"""
         tenant = extracted_data.get('tenant', {})
@@ -117,7 +624,13 @@ class WorkingResponseAgent:
 # ================================
 
 class BrokerChatGenerator:
-    def __init__(self):
+    # Default mix: 70% casual, 20% business, 8% tenant, 2% credit
+    DEFAULT_WEIGHTS = {'casual': 70, 'business': 20, 'tenant_app': 8, 'credit_req': 2}
+    
+    def __init__(self, seed=None, weights=None):
+        # A seeded generator replays the exact same chat, for benchmarks
+        self.rng = random.Random(seed)
+        self.weights = dict(weights or self.DEFAULT_WEIGHTS)
         self.brokers = ["Sarah_TLV", "Avi_RG", "Maya_Herz", "David_Rental", "Rachel_Props"]
         
         self.messages = {
@@ -158,31 +671,1782 @@ class BrokerChatGenerator:
     
     def get_message(self):
         """Get random broker message"""
-        # Weight: 70% casual, 20% business, 8% tenant, 2% credit
-        msg_type = random.choices(
-            ['casual', 'business', 'tenant_app', 'credit_req'],
-            weights=[70, 20, 8, 2]
-        )[0]
+        msg_type = self.rng.choices(list(self.weights), weights=list(self.weights.values()))[0]
         
-        broker = random.choice(self.brokers)
-        message = random.choice(self.messages[msg_type])
+        broker = self.rng.choice(self.brokers)
+        message = self.rng.choice(self.messages[msg_type])
         
         return broker, message, msg_type
 
+# ================================
+# EXTRACTION GUARDS
+# ================================
+
+class MessageGuard:
+    """Caps untrusted message size before any regex sees it"""
+    
+    def __init__(self, max_chars=4000, reject_chars=100000):
+        self.max_chars = max_chars
+        self.reject_chars = reject_chars
+        self.counters = {'truncated': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+    
+    def check(self, message):
+        """Return (message, verdict) where verdict is None, 'truncated' or 'rejected'"""
+        if len(message) <= self.max_chars:
+            return message, None
+        verdict = 'rejected' if len(message) > self.reject_chars else 'truncated'
+        with self._lock:
+            self.counters[verdict] += 1
+        return message[:self.max_chars], verdict
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, max_chars=self.max_chars, reject_chars=self.reject_chars)
+
+def _pool_scan(message):
+    """Scan in a pool worker; the lowercased copy is not sent back"""
+    scan = scanner.scan(message)
+    scan.pop('lower', None)
+    return scan
+
+class ExtractionPool:
+    """Runs MessageScanner on worker processes with a per-task time limit"""
+    
+    def __init__(self, workers=2, timeout=1.0, min_chars=1000, max_tasks_per_child=1000, task=_pool_scan):
+        self.workers = workers
+        self.timeout = timeout
+        self.min_chars = min_chars
+        self.max_tasks_per_child = max_tasks_per_child
+        # Runs in the pool, so it must be importable there (no closures or monkeypatches)
+        self.task = task
+        self.counters = {'tasks': 0, 'timeouts': 0, 'restarts': 0}
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def wants(self, message):
+        """Only messages this long are worth the IPC round trip"""
+        return len(message) >= self.min_chars
+    
+    def scan(self, message):
+        """Scan result, or None if the task ran past the time limit"""
+        return self.scan_many([message])[0]
+    
+    def scan_many(self, messages):
+        """Scan messages in parallel; any that time out come back as None"""
+        results = [None] * len(messages)
+        todo = list(range(len(messages)))
+        while todo:
+            pool = self._get_pool()
+            pending = [(i, pool.apply_async(self.task, (messages[i],))) for i in todo]
+            todo = []
+            for position, (i, async_result) in enumerate(pending):
+                finished = self._wait(pool, async_result)
+                if finished:
+                    results[i] = async_result.get()
+                    continue
+                if finished is False:
+                    # Killing the pool is the only way to stop a runaway
+                    # regex; whatever had not finished yet is resubmitted
+                    self._count('timeouts')
+                    self._restart(pool)
+                    rest = pending[position + 1:]
+                else:
+                    # Another thread's timeout killed the pool under this
+                    # task, so it did not time out itself: run it again
+                    rest = pending[position:]
+                for j, r in rest:
+                    if r.ready() and r.successful():
+                        results[j] = r.get()
+                    else:
+                        todo.append(j)
+                break
+            self._count('tasks', len(pending))
+        return results
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, workers=self.workers, timeout=self.timeout, min_chars=self.min_chars)
+    
+    def _wait(self, pool, async_result):
+        """True once ready, False if it timed out on the live pool, None if pool was replaced"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                async_result.wait(min(remaining, 0.05))
+            if async_result.ready():
+                return True
+            if self._pool is not pool:
+                return None
+            if remaining <= 0:
+                return False
+    
+    def _get_pool(self):
+        with self._lock:
+            # A pool inherited across fork belongs to the parent
+            if self._pool is None or self._pid != os.getpid():
+                # Never fork this process: gthread workers have other threads
+                # that may hold locks mid-fork. The fork server is started
+                # clean, imports this module once and forks pool workers from
+                # there, so a restart costs no re-import
+                context = multiprocessing.get_context(
+                    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                )
+                if context.get_start_method() == 'forkserver':
+                    context.set_forkserver_preload([__name__])
+                self._pool = context.Pool(self.workers, maxtasksperchild=self.max_tasks_per_child)
+                self._pid = os.getpid()
+            return self._pool
+    
+    def _restart(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                pool.terminate()
+                self._pool = None
+                self.counters['restarts'] += 1
+    
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+# ================================
+# PER-SENDER CONTEXT
+# ================================
+
+# Names many unrelated clients send under; merging on them would stitch
+# strangers' messages into one application
+PLACEHOLDER_SENDERS = frozenset(['', 'you', 'unknown'])
+
+def context_key(sender, client_id=None):
+    """Key for a sender's rolling context, or None when there is no real identity"""
+    if client_id:
+        return f"client:{client_id}"
+    if not isinstance(sender, str) or sender.strip().lower() in PLACEHOLDER_SENDERS:
+        return None
+    return sender
+
+class SenderState:
+    __slots__ = ('recent', 'partial', 'last_seen')
+    
+    def __init__(self, max_messages):
+        self.recent = deque(maxlen=max_messages)
+        self.partial = {}
+        self.last_seen = 0.0
+
+class SenderContext:
+    """Rolling per-sender state so an application split over messages still adds up"""
+    
+    def __init__(self, ttl=300, max_messages=5, max_senders=10000):
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.max_senders = max_senders
+        self.counters = {'merged': 0, 'expired': 0}
+        self._senders = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def merge(self, sender, message, scan):
+        """Fold this message into the sender's partial tenant; returns (scan, recent messages)"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            state = self._senders.get(sender)
+            if state is None:
+                state = self._senders[sender] = SenderState(self.max_messages)
+            else:
+                self._senders.move_to_end(sender)
+            state.last_seen = now
+            state.recent.append(message)
+            
+            # Fields in this message win; earlier ones only fill the gaps
+            carried = {field: value for field, value in state.partial.items() if field not in scan['fields']}
+            state.partial.update(scan['fields'])
+            if not carried:
+                return scan, None
+            self.counters['merged'] += 1
+            return dict(scan, fields=dict(carried, **scan['fields']), carried=tuple(carried)), list(state.recent)
+    
+    def clear(self, sender):
+        """Forget the partial tenant once it has been turned into a record"""
+        with self._lock:
+            state = self._senders.get(sender)
+            if state is not None:
+                state.partial.clear()
+                state.recent.clear()
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, senders=len(self._senders), ttl=self.ttl,
+                        max_messages=self.max_messages)
+    
+    def _expire(self, now):
+        # Senders are kept in last-seen order, so idle ones sit at the front
+        while self._senders:
+            sender, state = next(iter(self._senders.items()))
+            if len(self._senders) <= self.max_senders and now - state.last_seen < self.ttl:
+                break
+            del self._senders[sender]
+            self.counters['expired'] += 1
+
+# ================================
+# TENANT RECORD STORE
+# ================================
+
+# Words the name pattern drags in from a following field ("Dan Levi phone")
+NAME_NOISE = frozenset(['phone', 'tel', 'mobile', 'contact', 'salary', 'income', 'email', 'mail', 'nis'])
+
+# Shorter first names only match exactly: one letter off 'Dan' is a different person
+FUZZY_NAME_MIN = 4
+# Most recent same-last-name records compared when the exact name misses
+FUZZY_NAME_CANDIDATES = 100
+
+def name_tokens(value):
+    """Lowercased name words in the order written, field labels dropped"""
+    return [t for t in re.findall(r'[a-z]+', str(value or '').lower()) if t not in NAME_NOISE]
+
+def last_name(value):
+    """Last word of a name with at least first and last name, else None"""
+    tokens = name_tokens(value)
+    return tokens[-1] if len(tokens) >= 2 else None
+
+def within_one_edit(a, b):
+    """True if one letter changed, added or dropped turns a into b"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+def names_close(tokens, key):
+    """True if name key is tokens with a one-letter slip in the first name ('danel levi' / 'daniel levi')"""
+    first, others = tokens[0], key.split()
+    for token in tokens[1:]:
+        if token not in others:
+            return False
+        others.remove(token)
+    return (len(others) == 1 and min(len(first), len(others[0])) >= FUZZY_NAME_MIN
+            and within_one_edit(first, others[0]))
+
+def normalize_field(field, value):
+    """Index key for a tenant field, or None if there is nothing to index"""
+    if not value:
+        return None
+    value = str(value).strip().lower()
+    if field == 'phone':
+        digits = re.sub(r'\D', '', value)
+        if digits.startswith('972'):
+            digits = '0' + digits[3:]
+        return digits or None
+    if field == 'name':
+        # Word order and stray field labels should not split one applicant
+        return ' '.join(sorted(name_tokens(value))) or None
+    return value or None
+
+def parse_salary(value):
+    """Salary string as the extractor emits it ('15,000') to an int, or None"""
+    digits = str(value or '').replace(',', '').strip()
+    return int(digits) if digits.isdigit() else None
+
+def tenants_conflict(a, b):
+    """True if both tenants have a phone or email and they differ"""
+    for field in ('phone', 'email'):
+        key_a, key_b = normalize_field(field, a.get(field)), normalize_field(field, b.get(field))
+        if key_a and key_b and key_a != key_b:
+            return True
+    return False
+
+def merge_tenant_data(record, data, sender):
+    """Extraction data for record with a repeat application folded in"""
+    existing = record['data']
+    tenant = dict(existing.get('tenant', {}))
+    for field, value in data.get('tenant', {}).items():
+        if value and not tenant.get(field):
+            tenant[field] = value
+    senders = list(existing.get('senders') or [record['sender']])
+    if sender not in senders:
+        senders.append(sender)
+    return {
+        'tenant': tenant,
+        'extracted_count': len([v for v in tenant.values() if v]),
+        'duplicates': existing.get('duplicates', 0) + 1,
+        'senders': senders
+    }
+
+class TenantStore:
+    """Bounded record store with monotonic ids and secondary indexes"""
+    
+    INDEXED_FIELDS = ('name', 'phone', 'email', 'sender')
+    
+    def __init__(self, capacity=10000, max_age=None):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.last_id = 0
+        self.evicted = 0
+        self._records = OrderedDict()
+        self._indexes = {field: {} for field in self.INDEXED_FIELDS}
+        # Sorted (salary, id) pairs for range queries
+        self._salaries = []
+        # Last name -> {id: name key}, the candidates for a fuzzy name match
+        self._last_names = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._records)
+    
+    def add(self, message, sender, data):
+        """Store an extraction and return the new record"""
+        with self._lock:
+            record = self._insert(message, sender, data)
+            self._evict()
+            return record
+    
+    def add_many(self, items):
+        """Store (message, sender, data) items under a single lock"""
+        with self._lock:
+            records = [self._insert(*item) for item in items]
+            self._evict()
+            return records
+    
+    def find_duplicate(self, tenant):
+        """Existing record for the same applicant, by phone, email, then name"""
+        with self._lock:
+            return self._find_duplicate(tenant)
+    
+    def upsert_many(self, items):
+        """Store (message, sender, data) items, merging repeats; returns (record, created) pairs"""
+        with self._lock:
+            outcomes = []
+            for message, sender, data in items:
+                duplicate = self._find_duplicate(data.get('tenant', {}))
+                if duplicate is None:
+                    outcomes.append((self._insert(message, sender, data), True))
+                else:
+                    self._unindex(duplicate)
+                    duplicate['data'] = merge_tenant_data(duplicate, data, sender)
+                    self._index(duplicate)
+                    outcomes.append((duplicate, False))
+            self._evict()
+            return outcomes
+    
+    def since(self, cursor, limit=None):
+        """Records added after cursor, oldest first"""
+        with self._lock:
+            # Ids are allocated sequentially and only the oldest get evicted,
+            # so read forward from the cursor instead of scanning everything
+            start = max(cursor + 1, next(iter(self._records), self.last_id + 1))
+            newer = []
+            for record_id in range(start, self.last_id + 1):
+                record = self._records.get(record_id)
+                if record is not None:
+                    newer.append(record)
+                    if limit and len(newer) >= limit:
+                        break
+            return newer
+    
+    def lookup(self, field, value):
+        """Records whose indexed field equals value"""
+        with self._lock:
+            ids = self._indexes[field].get(normalize_field(field, value), ())
+            return [self._records[record_id] for record_id in sorted(ids)]
+    
+    def query(self, sender=None, min_salary=None, max_salary=None, start=None, end=None, after=0, limit=50):
+        """Records matching every given filter with id > after, oldest first"""
+        with self._lock:
+            if not self._records:
+                return []
+            low = max(after + 1, self._first_id_at(start) if start is not None else 0)
+            high = self._first_id_at(end) - 1 if end is not None else self.last_id
+            
+            candidates = None
+            if sender is not None:
+                candidates = self._indexes['sender'].get(normalize_field('sender', sender), set())
+            if min_salary is not None or max_salary is not None:
+                lo = bisect_left(self._salaries, (min_salary, 0)) if min_salary is not None else 0
+                hi = bisect_left(self._salaries, (max_salary + 1, 0)) if max_salary is not None else len(self._salaries)
+                in_range = {record_id for _, record_id in islice(self._salaries, lo, hi)}
+                candidates = in_range if candidates is None else candidates & in_range
+            
+            if candidates is None:
+                ids = islice((i for i in range(low, high + 1) if i in self._records), limit)
+            else:
+                ids = heapq.nsmallest(limit, (i for i in candidates if low <= i <= high))
+            return [self._records[record_id] for record_id in ids]
+    
+    def memory_usage(self):
+        """Approximate bytes held by records and indexes"""
+        with self._lock:
+            total = sys.getsizeof(self._records) + sys.getsizeof(self._salaries) + sys.getsizeof(self._last_names)
+            for record in self._records.values():
+                total += sys.getsizeof(record) + sys.getsizeof(record['message'])
+                total += sys.getsizeof(record['data'].get('tenant', {}))
+            for index in self._indexes.values():
+                total += sys.getsizeof(index)
+                total += sum(sys.getsizeof(ids) for ids in index.values())
+            return total
+    
+    def stats(self):
+        return {
+            'records': len(self._records),
+            'capacity': self.capacity,
+            'max_age': self.max_age,
+            'last_id': self.last_id,
+            'evicted': self.evicted,
+            'approx_bytes': self.memory_usage(),
+            'backend': 'memory'
+        }
+    
+    def _insert(self, message, sender, data):
+        self.last_id += 1
+        record = {
+            'id': self.last_id,
+            'timestamp': datetime.now().isoformat(),
+            'created': time.time(),
+            'message': message,
+            'sender': sender,
+            'data': data
+        }
+        self._records[record['id']] = record
+        self._index(record)
+        return record
+    
+    def _find_duplicate(self, tenant):
+        for field in ('phone', 'email'):
+            ids = self._indexes[field].get(normalize_field(field, tenant.get(field)))
+            if ids:
+                return self._records[max(ids)]
+        # Name alone only counts when it has at least first and last name
+        # and nothing we know about the candidate contradicts it
+        key = normalize_field('name', tenant.get('name'))
+        if key and ' ' in key:
+            for record_id in sorted(self._indexes['name'].get(key, ()), reverse=True):
+                candidate = self._records[record_id]
+                if not tenants_conflict(candidate['data'].get('tenant', {}), tenant):
+                    return candidate
+        # Then a one-letter slip in the first name, among the same last name
+        tokens = name_tokens(tenant.get('name'))
+        if len(tokens) >= 2:
+            keys = self._last_names.get(tokens[-1], {})
+            for record_id in sorted(keys, reverse=True)[:FUZZY_NAME_CANDIDATES]:
+                candidate = self._records[record_id]
+                if names_close(tokens, keys[record_id]) and not tenants_conflict(candidate['data'].get('tenant', {}), tenant):
+                    return candidate
+        return None
+    
+    def _index(self, record):
+        for field, value in self._index_keys(record):
+            self._indexes[field].setdefault(value, set()).add(record['id'])
+        salary = parse_salary(record['data'].get('tenant', {}).get('salary'))
+        if salary is not None:
+            insort(self._salaries, (salary, record['id']))
+        name = record['data'].get('tenant', {}).get('name')
+        surname = last_name(name)
+        if surname:
+            self._last_names.setdefault(surname, {})[record['id']] = normalize_field('name', name)
+    
+    def _unindex(self, record):
+        for field, value in self._index_keys(record):
+            ids = self._indexes[field].get(value)
+            if ids is not None:
+                ids.discard(record['id'])
+                if not ids:
+                    del self._indexes[field][value]
+        salary = parse_salary(record['data'].get('tenant', {}).get('salary'))
+        if salary is not None:
+            i = bisect_left(self._salaries, (salary, record['id']))
+            if i < len(self._salaries) and self._salaries[i] == (salary, record['id']):
+                del self._salaries[i]
+        surname = last_name(record['data'].get('tenant', {}).get('name'))
+        keys = self._last_names.get(surname)
+        if keys is not None:
+            keys.pop(record['id'], None)
+            if not keys:
+                del self._last_names[surname]
+    
+    def _index_keys(self, record):
+        tenant = record['data'].get('tenant', {})
+        for field in self.INDEXED_FIELDS:
+            value = normalize_field(field, record['sender'] if field == 'sender' else tenant.get(field))
+            if value:
+                yield field, value
+    
+    def _first_id_at(self, timestamp):
+        """Smallest live id created at or after timestamp, or last_id + 1"""
+        # Only the oldest records are ever evicted, so live ids are contiguous
+        # and in creation order: the id sequence doubles as the time index
+        lo, hi = next(iter(self._records)), self.last_id + 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._records[mid]['created'] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def _evict(self):
+        """Drop the oldest records past capacity or max age"""
+        cutoff = time.time() - self.max_age if self.max_age else None
+        while self._records:
+            oldest = next(iter(self._records.values()))
+            if len(self._records) <= self.capacity and (cutoff is None or oldest['created'] >= cutoff):
+                break
+            self._remove(oldest)
+    
+    def _remove(self, record):
+        del self._records[record['id']]
+        self._unindex(record)
+        self.evicted += 1
+
+# ================================
+# STATE BACKENDS
+# ================================
+
+# SharedCounters slots follow this order, so only ever append to it
+COUNTER_NAMES = ('messages', 'responses', 'extractions', 'duplicates')
+
+class LocalCounters:
+    """Per-process stats counters"""
+    
+    def __init__(self, names=COUNTER_NAMES):
+        self._values = {name: 0 for name in names}
+        self._lock = threading.Lock()
+    
+    def add(self, delta):
+        with self._lock:
+            for name, value in delta.items():
+                self._values[name] += value
+    
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+class SharedCounters:
+    """Stats counters in an mmap'd file shared by every worker on the host"""
+    
+    SLOT = struct.Struct('<q')
+    SLOTS = 64
+    
+    def __init__(self, path, names=COUNTER_NAMES):
+        if fcntl is None:
+            raise RuntimeError("SharedCounters needs fcntl (POSIX only)")
+        self.path = path
+        self.names = tuple(names)
+        self._offsets = {name: i * self.SLOT.size for i, name in enumerate(self.names)}
+        self._lock = threading.Lock()
+        
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.SLOTS * self.SLOT.size:
+                os.ftruncate(fd, self.SLOTS * self.SLOT.size)
+            self._mmap = mmap.mmap(fd, self.SLOTS * self.SLOT.size)
+        finally:
+            os.close(fd)
+        self._lock_file = None
+        self._pid = None
+    
+    def add(self, delta):
+        with self._locked():
+            for name, value in delta.items():
+                offset = self._offsets[name]
+                current, = self.SLOT.unpack_from(self._mmap, offset)
+                self.SLOT.pack_into(self._mmap, offset, current + value)
+    
+    def snapshot(self):
+        with self._locked():
+            return {name: self.SLOT.unpack_from(self._mmap, offset)[0]
+                    for name, offset in self._offsets.items()}
+    
+    @contextmanager
+    def _locked(self):
+        # flock serializes processes, the thread lock serializes this process
+        with self._lock:
+            if self._pid != os.getpid():
+                # flock belongs to the open file, and a forked worker would
+                # share its parent's, so every process opens its own
+                self._lock_file = open(self.path + '.lock', 'a')
+                self._pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+class SQLiteTenantStore:
+    """TenantStore with the same interface, kept in SQLite (WAL) so workers share it"""
+    
+    INDEXED_FIELDS = TenantStore.INDEXED_FIELDS
+    
+    def __init__(self, path, capacity=10000, max_age=None):
+        self.path = path
+        self.capacity = capacity
+        self.max_age = max_age
+        # One connection per store per process: a connection per request
+        # thread multiplied by groups runs out of file descriptors
+        self._lock = threading.RLock()
+        self._db = None
+        self._pid = None
+        
+        with self._connection() as conn, conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                sender TEXT,
+                message TEXT,
+                data TEXT,
+                name TEXT,
+                phone TEXT,
+                email TEXT,
+                salary INTEGER,
+                last_name TEXT
+            )""")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(records)")}
+            if 'salary' not in columns:
+                # Databases from before the salary index: add and backfill it
+                conn.execute("ALTER TABLE records ADD COLUMN salary INTEGER")
+                conn.executemany("UPDATE records SET salary = ? WHERE id = ?", [
+                    (parse_salary(json.loads(data).get('tenant', {}).get('salary')), record_id)
+                    for record_id, data in conn.execute("SELECT id, data FROM records").fetchall()
+                ])
+            if 'last_name' not in columns:
+                # Databases from before fuzzy name matching: add and backfill it
+                conn.execute("ALTER TABLE records ADD COLUMN last_name TEXT")
+                conn.executemany("UPDATE records SET last_name = ? WHERE id = ?", [
+                    (last_name(json.loads(data).get('tenant', {}).get('name')), record_id)
+                    for record_id, data in conn.execute("SELECT id, data FROM records").fetchall()
+                ])
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('evicted', 0)")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'normalized_keys'").fetchone() is None:
+                # Databases from before normalize_field held lower()-cased
+                # name/phone/email: re-key them from the stored tenant data
+                conn.executemany("UPDATE records SET name = ?, phone = ?, email = ? WHERE id = ?", [
+                    (*(normalize_field(field, tenant.get(field)) for field in ('name', 'phone', 'email')), record_id)
+                    for record_id, tenant in (
+                        (record_id, json.loads(data).get('tenant', {}))
+                        for record_id, data in conn.execute("SELECT id, data FROM records").fetchall()
+                    )
+                ])
+                conn.execute("INSERT INTO meta VALUES ('normalized_keys', 1)")
+            for field in self.INDEXED_FIELDS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS records_{field} ON records ({field})")
+            conn.execute("CREATE INDEX IF NOT EXISTS records_created ON records (created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS records_salary ON records (salary, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS records_last_name ON records (last_name, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS records_sender_key ON records (lower(trim(sender)), id)")
+        # SQLite connections must not cross a fork, so do not leave one
+        # open for workers forked from this process (gunicorn --preload)
+        self.close()
+    
+    def __len__(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    
+    @property
+    def last_id(self):
+        with self._connection() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'records'").fetchone()
+        return row[0] if row else 0
+    
+    def close(self):
+        with self._lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+    
+    def add(self, message, sender, data):
+        """Store an extraction and return the new record"""
+        return self.add_many([(message, sender, data)])[0]
+    
+    def add_many(self, items):
+        """Store (message, sender, data) items in a single transaction"""
+        records = []
+        with self._connection() as conn, conn:
+            for message, sender, data in items:
+                records.append(self._insert(conn, message, sender, data))
+            self._evict(conn)
+        return records
+    
+    def find_duplicate(self, tenant):
+        """Existing record for the same applicant, by phone, email, then name"""
+        with self._connection() as conn:
+            return self._find_duplicate(conn, tenant)
+    
+    def upsert_many(self, items):
+        """Store (message, sender, data) items, merging repeats; returns (record, created) pairs"""
+        outcomes = []
+        with self._connection() as conn, conn:
+            # Take the write lock up front so two workers cannot both miss
+            # the same duplicate and insert it twice
+            conn.execute("BEGIN IMMEDIATE")
+            for message, sender, data in items:
+                duplicate = self._find_duplicate(conn, data.get('tenant', {}))
+                if duplicate is None:
+                    outcomes.append((self._insert(conn, message, sender, data), True))
+                    continue
+                duplicate['data'] = merge_tenant_data(duplicate, data, sender)
+                tenant = duplicate['data']['tenant']
+                conn.execute(
+                    "UPDATE records SET data = ?, name = ?, phone = ?, email = ?, salary = ?, last_name = ? WHERE id = ?",
+                    (json.dumps(duplicate['data']),
+                     *(normalize_field(field, tenant.get(field)) for field in ('name', 'phone', 'email')),
+                     parse_salary(tenant.get('salary')), last_name(tenant.get('name')), duplicate['id'])
+                )
+                outcomes.append((duplicate, False))
+            self._evict(conn)
+        return outcomes
+    
+    def since(self, cursor, limit=None):
+        """Records added after cursor, oldest first"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, created, timestamp, sender, message, data FROM records "
+                "WHERE id > ? ORDER BY id LIMIT ?", (cursor, limit or -1)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+    
+    def lookup(self, field, value):
+        """Records whose indexed field equals value"""
+        if field not in self.INDEXED_FIELDS:
+            raise KeyError(field)
+        column_value = normalize_field(field, value)
+        if field == 'sender':
+            # Sender is stored as sent, so compare case-insensitively
+            query = "WHERE lower(trim(sender)) = ?"
+        else:
+            query = f"WHERE {field} = ?"
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, created, timestamp, sender, message, data FROM records "
+                f"{query} ORDER BY id", (column_value,)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+    
+    def query(self, sender=None, min_salary=None, max_salary=None, start=None, end=None, after=0, limit=50):
+        """Records matching every given filter with id > after, oldest first"""
+        clauses, params = ["id > ?"], [after]
+        if sender is not None:
+            clauses.append("lower(trim(sender)) = ?")
+            params.append(normalize_field('sender', sender))
+        if min_salary is not None:
+            clauses.append("salary >= ?")
+            params.append(min_salary)
+        if max_salary is not None:
+            clauses.append("salary <= ?")
+            params.append(max_salary)
+        if start is not None:
+            clauses.append("created >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("created < ?")
+            params.append(end)
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, created, timestamp, sender, message, data FROM records "
+                f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+    
+    def memory_usage(self):
+        """Bytes on disk for the database and its WAL"""
+        return sum(os.path.getsize(p) for p in (self.path, self.path + '-wal') if os.path.exists(p))
+    
+    def stats(self):
+        with self._connection() as conn:
+            evicted = conn.execute("SELECT value FROM meta WHERE key = 'evicted'").fetchone()[0]
+        return {
+            'records': len(self),
+            'capacity': self.capacity,
+            'max_age': self.max_age,
+            'last_id': self.last_id,
+            'evicted': evicted,
+            'approx_bytes': self.memory_usage(),
+            'backend': 'sqlite'
+        }
+    
+    def _insert(self, conn, message, sender, data):
+        record = {
+            'timestamp': datetime.now().isoformat(),
+            'created': time.time(),
+            'message': message,
+            'sender': sender,
+            'data': data
+        }
+        tenant = data.get('tenant', {})
+        cursor = conn.execute(
+            "INSERT INTO records (created, timestamp, sender, message, data, name, phone, email, salary, last_name) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record['created'], record['timestamp'], sender, message, json.dumps(data),
+             *(normalize_field(field, tenant.get(field)) for field in ('name', 'phone', 'email')),
+             parse_salary(tenant.get('salary')), last_name(tenant.get('name')))
+        )
+        record['id'] = cursor.lastrowid
+        return record
+    
+    def _find_duplicate(self, conn, tenant):
+        select = "SELECT id, created, timestamp, sender, message, data FROM records "
+        for field in ('phone', 'email'):
+            key = normalize_field(field, tenant.get(field))
+            if key:
+                row = conn.execute(select + f"WHERE {field} = ? ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+                if row:
+                    return self._record(row)
+        key = normalize_field('name', tenant.get('name'))
+        if key and ' ' in key:
+            for row in conn.execute(select + "WHERE name = ? ORDER BY id DESC", (key,)):
+                candidate = self._record(row)
+                if not tenants_conflict(candidate['data'].get('tenant', {}), tenant):
+                    return candidate
+        tokens = name_tokens(tenant.get('name'))
+        if len(tokens) >= 2:
+            # Compare name keys first; only close names pay for decoding the record
+            rows = conn.execute("SELECT id, name FROM records WHERE last_name = ? ORDER BY id DESC LIMIT ?",
+                                (tokens[-1], FUZZY_NAME_CANDIDATES)).fetchall()
+            for record_id, name_key in rows:
+                if name_key and names_close(tokens, name_key):
+                    candidate = self._record(conn.execute(select + "WHERE id = ?", (record_id,)).fetchone())
+                    if not tenants_conflict(candidate['data'].get('tenant', {}), tenant):
+                        return candidate
+        return None
+    
+    @staticmethod
+    def _record(row):
+        return {
+            'id': row[0],
+            'created': row[1],
+            'timestamp': row[2],
+            'sender': row[3],
+            'message': row[4],
+            'data': json.loads(row[5])
+        }
+    
+    def _evict(self, conn):
+        """Drop the oldest records past capacity or max age"""
+        evicted = 0
+        if self.max_age:
+            evicted += conn.execute("DELETE FROM records WHERE created < ?",
+                                    (time.time() - self.max_age,)).rowcount
+        boundary = conn.execute("SELECT id FROM records ORDER BY id DESC LIMIT 1 OFFSET ?",
+                                (self.capacity,)).fetchone()
+        if boundary:
+            evicted += conn.execute("DELETE FROM records WHERE id <= ?", boundary).rowcount
+        if evicted:
+            conn.execute("UPDATE meta SET value = value + ? WHERE key = 'evicted'", (evicted,))
+    
+    @contextmanager
+    def _connection(self):
+        """The process's connection, held under the store's lock; reopened in forked children"""
+        with self._lock:
+            if self._db is None or self._pid != os.getpid():
+                self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._pid = os.getpid()
+            yield self._db
+
+def create_state(backend, state_dir=None, capacity=10000, max_age=None):
+    """Build the (stats, data_store) pair for a backend: 'memory' or 'shared'"""
+    if backend == 'memory':
+        return LocalCounters(), TenantStore(capacity=capacity, max_age=max_age)
+    if backend == 'shared':
+        state_dir = state_dir or os.path.join(tempfile.gettempdir(), 'realestate-demo')
+        os.makedirs(state_dir, exist_ok=True)
+        return (
+            SharedCounters(os.path.join(state_dir, 'stats.bin')),
+            SQLiteTenantStore(os.path.join(state_dir, 'records.db'), capacity=capacity, max_age=max_age)
+        )
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+
+# ================================
+# BROKER GROUPS
+# ================================
+
+DEFAULT_GROUP = 'default'
+# Group ids double as directory names for the shared backend
+GROUP_ID = re.compile(r'[A-Za-z0-9_@:-][A-Za-z0-9_.@:-]{0,63}')
+
+class GroupRouteError(Exception):
+    """Bad group id (400), or a group another shard owns (421)"""
+    
+    def __init__(self, message, status=400, shard=None):
+        super().__init__(message)
+        self.status = status
+        self.shard = shard
+
+def parse_group(value):
+    """Validated group id, or DEFAULT_GROUP when none was given"""
+    if value is None or value == '':
+        return DEFAULT_GROUP
+    if not isinstance(value, str) or not GROUP_ID.fullmatch(value):
+        raise GroupRouteError("group must be 1-64 letters, digits or _.@:- and not start with '.'")
+    return value
+
+class ShardRing:
+    """Consistent-hash ring mapping group ids to shards"""
+    
+    def __init__(self, shards, replicas=64):
+        self.shards = shards
+        self.replicas = replicas
+        # Virtual nodes even out the split; adding a shard only moves the
+        # groups that land on its points, about 1/shards of them
+        points = sorted((self._hash(f"shard-{shard}-{i}"), shard)
+                        for shard in range(shards) for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+    
+    def shard_for(self, group_id):
+        i = bisect_left(self._hashes, self._hash(group_id))
+        return self._owners[i % len(self._owners)]
+    
+    @staticmethod
+    def _hash(key):
+        # Stable across processes and hosts, unlike hash()
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+# Marks a deleted group generation on the shared backend; other workers may
+# still have its SQLite and mmap files open, so they are never removed in place
+TOMBSTONE = 'TOMBSTONE'
+
+class GroupState:
+    """One broker group's partition: counters, records, chat and sender context"""
+    
+    def __init__(self, group_id, stats, store, chat_gen=None, sender_context=None, history=200, path=None):
+        self.id = group_id
+        self.stats = stats
+        self.store = store
+        self.chat_gen = chat_gen or BrokerChatGenerator()
+        self.sender_context = sender_context
+        self.history = deque(maxlen=history)
+        self.path = path
+        self.created = time.time()
+        self.last_seen = self.created
+    
+    def log(self, message, sender, result):
+        """Remember a processed message in the group's recent history"""
+        self.history.append({
+            'timestamp': datetime.now().isoformat(),
+            'sender': sender,
+            'message': message,
+            'status': result['status'],
+            'duplicate_of': result['duplicate_of']
+        })
+    
+    def summary(self):
+        return {
+            'group': self.id,
+            'stats': self.stats.snapshot(),
+            'records': len(self.store),
+            'cursor': self.store.last_id,
+            'history': len(self.history),
+            'created': self.created,
+            'last_seen': self.last_seen
+        }
+    
+    def tombstone(self):
+        """Mark the group's files deleted; workers that still have them open drop them on next use"""
+        if self.path:
+            with open(os.path.join(self.path, TOMBSTONE), 'w') as f:
+                f.write(datetime.now().isoformat())
+    
+    def tombstoned(self):
+        return self.path is not None and os.path.exists(os.path.join(self.path, TOMBSTONE))
+
+class GroupRegistry:
+    """The groups this shard owns, created on first use and dropped least recently used"""
+    
+    def __init__(self, factory, default, max_groups=1000, ring=None, shard=0):
+        self.factory = factory
+        self.max_groups = max_groups
+        self.ring = ring
+        self.shard = shard
+        self.counters = {'created': 0, 'evicted': 0, 'misrouted': 0}
+        self._groups = OrderedDict([(default.id, default)])
+        self._lock = threading.Lock()
+    
+    def owner(self, group_id):
+        return self.ring.shard_for(group_id) if self.ring else self.shard
+    
+    def get(self, group_id, create=True):
+        """State for group_id; raises GroupRouteError if another shard owns it"""
+        owner = self.owner(group_id)
+        if owner != self.shard:
+            with self._lock:
+                self.counters['misrouted'] += 1
+            raise GroupRouteError(f"group {group_id} belongs to shard {owner}", status=421, shard=owner)
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is not None and group.tombstoned():
+                # Deleted through another worker
+                del self._groups[group_id]
+                group = None
+            if group is not None:
+                self._groups.move_to_end(group_id)
+            elif create:
+                group = self._groups[group_id] = self.factory(group_id)
+                self.counters['created'] += 1
+                self._evict()
+            if group is not None:
+                group.last_seen = time.time()
+            return group
+    
+    def evict(self, group_id):
+        """Drop a group and tombstone what it stored; False if it was not loaded"""
+        if group_id == DEFAULT_GROUP:
+            raise GroupRouteError("the default group cannot be evicted")
+        with self._lock:
+            group = self._groups.pop(group_id, None)
+            if group is not None:
+                self.counters['evicted'] += 1
+        if group is None:
+            return False
+        group.tombstone()
+        return True
+    
+    def groups(self):
+        with self._lock:
+            return list(self._groups.values())
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, loaded=len(self._groups), max_groups=self.max_groups,
+                        shard=self.shard, shards=self.ring.shards if self.ring else 1)
+    
+    def _evict(self):
+        # Idle groups past max_groups leave memory; on the shared backend
+        # their records stay on disk and load again on next use
+        while len(self._groups) > self.max_groups:
+            group_id = next(g for g in self._groups if g != DEFAULT_GROUP)
+            del self._groups[group_id]
+            self.counters['evicted'] += 1
+
+# ================================
+# LIVE FEED (SERVER-SENT EVENTS)
+# ================================
+
+class FeedFull(Exception):
+    """Every viewer slot is taken; each one holds a worker thread while connected"""
+
+class FeedSubscriber:
+    def __init__(self, max_queue, group=None):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.group = group
+        self.dropped = False
+
+class FeedLog:
+    """Feed events in one SQLite file that every worker appends to and reads by cursor"""
+    
+    def __init__(self, path, max_events=1000, viewer_ttl=10.0):
+        self.path = path
+        self.max_events = max_events
+        self.viewer_ttl = viewer_ttl
+        self._viewers_path = path + '.viewers'
+        self._heartbeat = 0.0
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        with self._connection() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS events ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, grp TEXT, payload TEXT NOT NULL)")
+        # Not left open across fork, like SQLiteTenantStore
+        with self._lock:
+            self._db.close()
+            self._db = None
+    
+    @property
+    def last_id(self):
+        with self._connection() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        return row[0] if row else 0
+    
+    def append(self, group, payload):
+        with self._connection() as conn, conn:
+            event_id = conn.execute("INSERT INTO events (grp, payload) VALUES (?, ?)", (group, payload)).lastrowid
+            if event_id % 100 == 0:
+                conn.execute("DELETE FROM events WHERE id <= ?", (event_id - self.max_events,))
+    
+    def since(self, cursor, limit=500):
+        """(id, group, payload) rows after cursor, oldest first"""
+        with self._connection() as conn:
+            return conn.execute("SELECT id, grp, payload FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                                (cursor, limit)).fetchall()
+    
+    def mark_watched(self):
+        """Tell the chat generator, whichever worker runs it, that someone is watching"""
+        now = time.time()
+        if now - self._heartbeat >= 1.0:
+            self._heartbeat = now
+            with open(self._viewers_path, 'a'):
+                os.utime(self._viewers_path)
+    
+    def watched(self):
+        try:
+            return time.time() - os.path.getmtime(self._viewers_path) < self.viewer_ttl
+        except FileNotFoundError:
+            return False
+    
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            if self._db is None or self._pid != os.getpid():
+                self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._pid = os.getpid()
+            yield self._db
+
+class FeedHub:
+    """Fans processed events out to SSE subscribers with bounded queues.
+    
+    With a FeedLog, events go through the shared log instead, and a pump
+    thread in each process delivers them to that process's subscribers,
+    so a viewer sees what every worker processed.
+    """
+    
+    def __init__(self, max_queue=100, log=None, poll_interval=0.25, max_subscribers=None):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.log = log
+        self.poll_interval = poll_interval
+        self.counters = {'published': 0, 'delivered': 0, 'dropped_subscribers': 0, 'refused_subscribers': 0}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._has_subscribers = threading.Event()
+        self._pump = None
+    
+    def subscribe(self, group=None):
+        """New subscriber for one group's events, or every group's if None; FeedFull past max_subscribers"""
+        subscriber = FeedSubscriber(self.max_queue, group)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.counters['refused_subscribers'] += 1
+                raise FeedFull()
+            self._subscribers.add(subscriber)
+            self._has_subscribers.set()
+            if self.log is not None and (self._pump is None or not self._pump.is_alive()):
+                self._pump = threading.Thread(target=self._run_pump, name='feed-pump', daemon=True)
+                self._pump.start()
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self._has_subscribers.clear()
+    
+    def publish(self, event):
+        """Queue event for every subscriber, dropping any that fell behind"""
+        payload = json.dumps(event)
+        with self._lock:
+            self.counters['published'] += 1
+        if self.log is not None:
+            # Every process's pump delivers it, this one's included
+            self.log.append(event.get('group'), payload)
+        else:
+            self._deliver(event.get('group'), payload)
+    
+    def _deliver(self, group, payload):
+        with self._lock:
+            for subscriber in list(self._subscribers):
+                if subscriber.group is not None and subscriber.group != group:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(payload)
+                    self.counters['delivered'] += 1
+                except queue.Full:
+                    # A slow consumer must not hold events for everyone else
+                    subscriber.dropped = True
+                    self._subscribers.discard(subscriber)
+                    self.counters['dropped_subscribers'] += 1
+            if not self._subscribers:
+                self._has_subscribers.clear()
+    
+    def wait_for_subscribers(self, timeout=None):
+        if self.log is None:
+            return self._has_subscribers.wait(timeout)
+        # Viewers may be on any worker; their pumps heartbeat through the log
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.log.watched():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(1.0)
+        return True
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, subscribers=len(self._subscribers), max_queue=self.max_queue,
+                        max_subscribers=self.max_subscribers, shared=self.log is not None)
+    
+    def _run_pump(self):
+        cursor = None
+        while True:
+            if not self._has_subscribers.is_set():
+                # Nobody here to deliver to: skip what happens meanwhile
+                self._has_subscribers.wait()
+                cursor = None
+            if cursor is None:
+                cursor = self.log.last_id
+            self.log.mark_watched()
+            try:
+                for event_id, group, payload in self.log.since(cursor):
+                    cursor = event_id
+                    self._deliver(group, payload)
+            except sqlite3.Error as e:
+                print(f"⚠️ Feed log error: {e}")
+            time.sleep(self.poll_interval)
+
+class BrokerFeed:
+    """Background broker chat, processed once and broadcast to every viewer.
+    
+    With lock_path, only the process holding an flock on it generates, so
+    several workers sharing state do not each commit their own chat.
+    """
+    
+    def __init__(self, hub, generator, min_delay=1.5, max_delay=4.5, lock_path=None):
+        self.hub = hub
+        self.generator = generator
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.lock_path = lock_path
+        self._thread = None
+        self._lock = threading.Lock()
+        self._lock_file = None
+    
+    def leads(self):
+        """True if this process generates the chat; the OS releases the lock if it dies"""
+        if self.lock_path is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+    
+    def ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='broker-feed', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            if not self.leads():
+                time.sleep(5.0)
+                continue
+            # Only generate chat while somebody is watching
+            self.hub.wait_for_subscribers()
+            time.sleep(random.uniform(self.min_delay, self.max_delay))
+            broker, message, msg_type = self.generator.get_message()
+            try:
+                publish_result(message, broker, run_pipeline(message, sender=broker),
+                               origin='broker', msg_type=msg_type)
+            except Exception as e:
+                print(f"⚠️ Broker feed error: {e}")
+
+# ================================
+# ADMISSION CONTROL
+# ================================
+
+class AdmissionRejected(Exception):
+    """Server is saturated - answer 429 and let the client come back later"""
+    
+    def __init__(self, retry_after):
+        super().__init__(f"server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounds in-flight requests, queues a few briefly and sheds the rest"""
+    
+    def __init__(self, max_inflight=16, max_queue=8, queue_timeout=2.0):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.counters = {'admitted': 0, 'priority_admitted': 0, 'queued': 0,
+                         'shed': 0, 'priority_shed': 0, 'timeouts': 0, 'displaced': 0}
+        # One wait queue per lane, each up to max_queue; a freed slot goes
+        # to the urgent lane first, so casual chat never delays a screening.
+        # A full urgent lane borrows the newest casual waiter's place
+        self._lanes = {True: deque(), False: deque()}
+        self._service_time = 0.0
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def admit(self, priority=False):
+        """Hold a slot for the duration of the block or raise AdmissionRejected"""
+        self._acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+    
+    def queue_depth(self):
+        with self._lock:
+            return len(self._lanes[True]) + len(self._lanes[False])
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, inflight=self.inflight, max_inflight=self.max_inflight,
+                        queued_priority=len(self._lanes[True]), queued_normal=len(self._lanes[False]),
+                        max_queue=self.max_queue, queue_timeout=self.queue_timeout,
+                        service_ms=round(self._service_time * 1000, 2))
+    
+    def _acquire(self, priority):
+        with self._lock:
+            if self.inflight < self.max_inflight:
+                self.inflight += 1
+                self._admitted(priority)
+                return
+            lane = self._lanes[priority]
+            if len(lane) >= self.max_queue:
+                normal = self._lanes[False]
+                if not (priority and normal):
+                    raise self._shed(priority)
+                bumped = normal.pop()
+                bumped.displaced = True
+                bumped.set()
+                self.counters['displaced'] += 1
+            waiter = threading.Event()
+            waiter.displaced = False
+            lane.append(waiter)
+            self.counters['queued'] += 1
+        
+        granted = waiter.wait(self.queue_timeout)
+        with self._lock:
+            if waiter.displaced:
+                # Woken to make room for an urgent request, not given a slot
+                raise self._shed(priority)
+            # The slot may have been handed over just as the wait timed out
+            if not granted and not waiter.is_set():
+                lane.remove(waiter)
+                self.counters['timeouts'] += 1
+                raise self._shed(priority)
+            self._admitted(priority)
+    
+    def _release(self, held):
+        with self._lock:
+            self._service_time += (held - self._service_time) * 0.1
+            for lane in (self._lanes[True], self._lanes[False]):
+                if lane:
+                    # Hand the slot straight over; inflight stays the same
+                    lane.popleft().set()
+                    return
+            self.inflight -= 1
+    
+    def _admitted(self, priority):
+        self.counters['priority_admitted' if priority else 'admitted'] += 1
+    
+    def _shed(self, priority):
+        self.counters['priority_shed' if priority else 'shed'] += 1
+        # Roughly how long until the current queue has drained
+        waiting = len(self._lanes[True]) + len(self._lanes[False])
+        return AdmissionRejected(max(1, round((waiting + 1) * self._service_time / self.max_inflight)))
+
+# ================================
+# METRICS
+# ================================
+
+class Metrics:
+    """Stage latency histograms and counters rendered in Prometheus text format"""
+    
+    BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+               0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    RATE_WINDOW = 60
+    
+    def __init__(self, prefix='realestate'):
+        self.prefix = prefix
+        self._histograms = {}
+        self._reasons = {}
+        self._requests = {}
+        self._rate = deque()
+        self._lock = threading.Lock()
+    
+    def observe(self, stage, seconds):
+        """Record one stage duration"""
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+            hist[0][bisect_left(self.BUCKETS, seconds)] += 1
+            hist[1] += seconds
+    
+    def count_reasons(self, decisions):
+        with self._lock:
+            for decision in decisions:
+                key = (decision['reason'], decision['should_respond'])
+                self._reasons[key] = self._reasons.get(key, 0) + 1
+    
+    def count_request(self, endpoint, messages=1):
+        now = int(time.time())
+        with self._lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            # Per-second buckets over the last minute for the rate gauge
+            if self._rate and self._rate[-1][0] == now:
+                self._rate[-1][1] += messages
+            else:
+                self._rate.append([now, messages])
+            while self._rate[0][0] <= now - self.RATE_WINDOW:
+                self._rate.popleft()
+    
+    def summary(self):
+        """Count and mean milliseconds per stage"""
+        with self._lock:
+            return {stage: {'count': sum(counts), 'mean_ms': round(total / sum(counts) * 1000, 4)}
+                    for stage, (counts, total) in self._histograms.items() if sum(counts)}
+    
+    def message_rate(self):
+        cutoff = int(time.time()) - self.RATE_WINDOW
+        with self._lock:
+            return sum(count for second, count in self._rate if second > cutoff) / self.RATE_WINDOW
+    
+    def render(self, counters=None, gauges=None):
+        """Prometheus text exposition of everything recorded so far"""
+        p = self.prefix
+        rate = self.message_rate()
+        lines = []
+        with self._lock:
+            lines += [f"# HELP {p}_stage_seconds Time spent in each /process pipeline stage",
+                      f"# TYPE {p}_stage_seconds histogram"]
+            for stage, (counts, total) in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS, counts):
+                    cumulative += count
+                    lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+            
+            lines += [f"# HELP {p}_decisions_total Monitor decisions by reason",
+                      f"# TYPE {p}_decisions_total counter"]
+            for (reason, responded), count in sorted(self._reasons.items()):
+                lines.append(f'{p}_decisions_total{{reason="{_label(reason)}",'
+                             f'responded="{str(responded).lower()}"}} {count}')
+            
+            lines += [f"# HELP {p}_requests_total HTTP requests by endpoint",
+                      f"# TYPE {p}_requests_total counter"]
+            for endpoint, count in sorted(self._requests.items()):
+                lines.append(f'{p}_requests_total{{endpoint="{_label(endpoint)}"}} {count}')
+        
+        lines += [f"# HELP {p}_message_rate Messages per second over the last {self.RATE_WINDOW}s",
+                  f"# TYPE {p}_message_rate gauge",
+                  f"{p}_message_rate {rate:.4f}"]
+        for name, value in (counters or {}).items():
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+        for name, value in (gauges or {}).items():
+            lines += [f"# TYPE {p}_{name} gauge", f"{p}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+def _label(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# ================================
+# BULK INGEST
+# ================================
+
+# WhatsApp exports: "[16/10/2026, 09:15:02] Sarah_TLV: text" (iOS)
+# or "16/10/2026, 09:15 - Sarah_TLV: text" (Android)
+WHATSAPP_STAMP = re.compile(
+    r'^\[?\d{1,2}[./-]\d{1,2}[./-]\d{2,4},?\s+\d{1,2}:\d{2}(?::\d{2})?(?:\s?[APap]\.?[Mm]\.?)?\]?\s*(?:-\s*)?'
+)
+WHATSAPP_SENDER = re.compile(r'([^:]{1,60}?):\s(.*)$', re.DOTALL)
+INGEST_MAX_MESSAGE = 4000
+
+def iter_text_lines(stream, encoding='utf-8'):
+    """Decode a binary stream line by line without reading it all"""
+    for raw in stream:
+        yield raw.decode(encoding, errors='replace').rstrip('\r\n').lstrip('\ufeff\u200e')
+
+def parse_chat_lines(lines, fmt='auto'):
+    """Yield (sender, message) from NDJSON or WhatsApp export lines"""
+    pending = None
+    for line in lines:
+        if not line.strip():
+            continue
+        
+        if fmt in ('auto', 'ndjson') and line.lstrip().startswith('{'):
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            if isinstance(item, dict):
+                if pending:
+                    yield pending
+                    pending = None
+                yield str(item.get('sender') or 'Unknown'), str(item.get('message', ''))
+                continue
+        if fmt == 'ndjson':
+            continue
+        
+        stamp = WHATSAPP_STAMP.match(line)
+        if stamp:
+            if pending:
+                yield pending
+            # Timestamped lines without "sender: " are system notices
+            match = WHATSAPP_SENDER.match(line, stamp.end())
+            pending = (match.group(1).strip(), match.group(2)) if match else None
+        elif pending and len(pending[1]) < INGEST_MAX_MESSAGE:
+            # Multi-line messages continue on lines without a timestamp
+            pending = (pending[0], (pending[1] + '\n' + line)[:INGEST_MAX_MESSAGE])
+    if pending:
+        yield pending
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def ingest_messages(messages, chunk_size=500, group=None):
+    """Run (sender, message) pairs through the pipeline chunk by chunk, yielding progress"""
+    group = group or default_group
+    started = time.perf_counter()
+    totals = {'messages': 0, 'responses': 0, 'extractions': 0, 'duplicates': 0, 'records': 0, 'chunks': 0}
+    
+    for chunk in chunked(messages, chunk_size):
+        # History gets no replies: nobody would read them, and each is a model call
+        results = run_pipeline_many([message for _, message in chunk], [sender for sender, _ in chunk], group,
+                                    replies=False)
+        batch = [(message, sender, result) for (sender, message), result in zip(chunk, results)]
+        delta, records = commit_results(batch, group)
+        metrics.count_request('ingest', len(batch))
+        
+        for key in ('messages', 'responses', 'extractions', 'duplicates'):
+            totals[key] += delta[key]
+        totals['records'] += len(records)
+        totals['chunks'] += 1
+        elapsed = time.perf_counter() - started
+        yield dict(totals, elapsed_s=round(elapsed, 3),
+                   msgs_per_sec=round(totals['messages'] / elapsed, 1) if elapsed else None,
+                   cursor=group.store.last_id)
+
+# ================================
+# PRECOMPILED STATIC ASSETS
+# ================================
+
+class StaticAsset:
+    """Bytes built once at startup, kept gzipped, served with an ETag"""
+    
+    def __init__(self, body, mimetype, cache_control):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.version = hashlib.sha256(self.body).hexdigest()[:16]
+        self.etag = self.version
+    
+    @classmethod
+    def from_file(cls, path, mimetype, cache_control):
+        with open(path, 'rb') as f:
+            return cls(f.read(), mimetype, cache_control)
+    
+    def response(self):
+        """304 when the client has it, else the gzip or identity bytes"""
+        # 'gzip;q=0' lists gzip but refuses it
+        use_gzip = request.accept_encodings['gzip'] > 0
+        # Each encoding is a different representation, so it gets its own tag
+        etag = self.etag + ('-gz' if use_gzip else '')
+        headers = {'Cache-Control': self.cache_control, 'Vary': 'Accept-Encoding', 'ETag': f'"{etag}"'}
+        
+        # Proxies that re-encode bodies weaken the tag (W/"..."); still a match
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers=headers)
+        
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+            return Response(self.gzipped, mimetype=self.mimetype, headers=headers)
+        return Response(self.body, mimetype=self.mimetype, headers=headers)
+
+def build_assets():
+    """Load static files and render the index page once"""
+    immutable = 'public, max-age=31536000, immutable'
+    assets = {
+        'app.css': StaticAsset.from_file(os.path.join(STATIC_DIR, 'app.css'), 'text/css', immutable),
+        'app.js': StaticAsset.from_file(os.path.join(STATIC_DIR, 'app.js'), 'application/javascript', immutable)
+    }
+    # Asset URLs carry a content hash, so they can be cached forever while
+    # the page itself is revalidated with a cheap conditional GET
+    with app.app_context():
+        page = render_template_string(
+            HTML_TEMPLATE,
+            css_url=f"/static/app.css?v={assets['app.css'].version}",
+            js_url=f"/static/app.js?v={assets['app.js'].version}"
+        )
+    return StaticAsset(page, 'text/html', 'no-cache'), assets
+
 # ================================
 # FLASK APP
 # ================================
 
 # Initialize components
-monitor = WorkingMonitorAgent()
-extractor = WorkingDataExtractor()
-responder = WorkingResponseAgent()
+CACHE_SIZE = int(os.getenv('CACHE_SIZE', 2048))
+CACHE_TTL = int(os.getenv('CACHE_TTL', 300))
+decision_cache = ResponseCache(CACHE_SIZE, CACHE_TTL, mask_digits=os.getenv('CACHE_MASK_DIGITS', '1') == '1')
+# Replies quote names and salaries back, so their keys never mask digits
+reply_cache = ResponseCache(CACHE_SIZE, CACHE_TTL)
+
+scanner = MessageScanner()
+monitor = WorkingMonitorAgent(scanner, cache=decision_cache)
+extractor = WorkingDataExtractor(scanner)
+responder = WorkingResponseAgent(monitor.gateway, cache=reply_cache)
 chat_gen = BrokerChatGenerator()
 
-# Global data
-chat_log = []
-data_store = {}
-stats = {"messages": 0, "responses": 0, "extractions": 0}
+# Global data: stats counts every group on this shard, data_store holds the
+# default group's records (see BROKER GROUPS for the other groups)
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+STATE_DIR = os.getenv('STATE_DIR') or os.path.join(tempfile.gettempdir(), 'realestate-demo')
+STORE_MAX_AGE = int(os.getenv('STORE_MAX_AGE', 0)) or None
+stats, data_store = create_state(
+    STATE_BACKEND,
+    state_dir=STATE_DIR,
+    capacity=int(os.getenv('STORE_CAPACITY', 10000)),
+    max_age=STORE_MAX_AGE
+)
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+# Records returned with a /process reply; clients page through /data for the rest
+RECORD_DELTA_LIMIT = int(os.getenv('RECORD_DELTA_LIMIT', 50))
+DEDUP_ENABLED = os.getenv('DEDUP', '1') == '1'
+
+def new_sender_context():
+    # CONTEXT_TTL=0 turns per-sender context off
+    if int(os.getenv('CONTEXT_TTL', 300)) <= 0:
+        return None
+    return SenderContext(
+        ttl=int(os.getenv('CONTEXT_TTL', 300)),
+        max_messages=int(os.getenv('CONTEXT_MESSAGES', 5)),
+        max_senders=int(os.getenv('CONTEXT_MAX_SENDERS', 10000))
+    )
+
+sender_context = new_sender_context()
+
+# Each broker group gets its own partition; SHARD_COUNT > 1 runs one
+# instance per shard (SHARD_INDEX) behind a router hashing the group id
+GROUP_HISTORY = int(os.getenv('GROUP_HISTORY', 200))
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 1))
+SHARD_INDEX = int(os.getenv('SHARD_INDEX', 0))
+SHARD_URLS = [url.rstrip('/') for url in os.getenv('SHARD_URLS', '').split(',') if url]
+
+def group_dir(group_id, generation=0):
+    base = os.path.join(STATE_DIR, 'groups', group_id)
+    return os.path.join(base, f'gen-{generation}') if generation else base
+
+def live_group_dir(group_id):
+    """The group's first generation without a tombstone; a deleted group starts over in a new one"""
+    generation = 0
+    while os.path.exists(os.path.join(group_dir(group_id, generation), TOMBSTONE)):
+        generation += 1
+    return group_dir(group_id, generation)
+
+# Workers drop a tombstoned group on their next use of it; after this long
+# none can still be writing, so the generation's files are removed
+GROUP_TOMBSTONE_GRACE = float(os.getenv('GROUP_TOMBSTONE_GRACE', 600))
+
+def reap_tombstones(grace=None, now=None):
+    """Delete the files of generations tombstoned over grace seconds ago; returns how many went.
+    The TOMBSTONE itself stays so live_group_dir still skips the generation"""
+    grace = GROUP_TOMBSTONE_GRACE if grace is None else grace
+    now = now or time.time()
+    root = os.path.join(STATE_DIR, 'groups')
+    reaped = 0
+    for group_id in (os.listdir(root) if os.path.isdir(root) else ()):
+        generation = 0
+        while os.path.exists(os.path.join(group_dir(group_id, generation), TOMBSTONE)):
+            path = group_dir(group_id, generation)
+            generation += 1
+            try:
+                if now - os.path.getmtime(os.path.join(path, TOMBSTONE)) < grace:
+                    continue
+                names = [name for name in os.listdir(path)
+                         if name != TOMBSTONE and os.path.isfile(os.path.join(path, name))]
+                for name in names:
+                    os.remove(os.path.join(path, name))
+            except FileNotFoundError:
+                # Another worker is reaping the same generation
+                continue
+            reaped += bool(names)
+    return reaped
+
+def create_group(group_id):
+    """State partition for a new broker group on the configured backend"""
+    path = live_group_dir(group_id) if STATE_BACKEND == 'shared' else None
+    group_stats, store = create_state(
+        STATE_BACKEND,
+        state_dir=path,
+        capacity=int(os.getenv('GROUP_STORE_CAPACITY', 2000)),
+        max_age=STORE_MAX_AGE
+    )
+    return GroupState(group_id, group_stats, store, sender_context=new_sender_context(),
+                      history=GROUP_HISTORY, path=path)
+
+if STATE_BACKEND == 'shared':
+    os.makedirs(group_dir(DEFAULT_GROUP), exist_ok=True)
+    default_stats = SharedCounters(os.path.join(group_dir(DEFAULT_GROUP), 'stats.bin'))
+else:
+    default_stats = LocalCounters()
+default_group = GroupState(DEFAULT_GROUP, default_stats, data_store, chat_gen, sender_context,
+                           history=GROUP_HISTORY)
+groups = GroupRegistry(
+    create_group, default_group,
+    max_groups=int(os.getenv('GROUP_MAX', 1000)),
+    ring=ShardRing(SHARD_COUNT) if SHARD_COUNT > 1 else None,
+    shard=SHARD_INDEX
+)
+
+if STATE_BACKEND == 'shared' and reap_tombstones():
+    print("🧹 Removed files of deleted groups")
+
+metrics = Metrics()
+
+# ADMISSION_MAX_INFLIGHT=0 turns admission control off
+admission = AdmissionController(
+    max_inflight=int(os.getenv('ADMISSION_MAX_INFLIGHT', 16)),
+    max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 8)),
+    queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 2.0))
+) if int(os.getenv('ADMISSION_MAX_INFLIGHT', 16)) > 0 else None
+
+message_guard = MessageGuard(
+    max_chars=int(os.getenv('MAX_MESSAGE_CHARS', 4000)),
+    reject_chars=int(os.getenv('REJECT_MESSAGE_CHARS', 100000))
+)
+# EXTRACT_MODE=pool moves long-message and bulk scanning to worker processes
+extraction_pool = ExtractionPool(
+    workers=int(os.getenv('EXTRACT_WORKERS', 2)),
+    timeout=float(os.getenv('EXTRACT_TIMEOUT', 1.0)),
+    min_chars=int(os.getenv('EXTRACT_POOL_MIN_CHARS', 1000))
+) if os.getenv('EXTRACT_MODE', 'inline') == 'pool' else None
+
+# Workers sharing state also share the feed: one chat generator, events
+# fanned out from a log every worker reads
+# Each /stream viewer holds a gunicorn thread for as long as it is connected;
+# gunicorn.conf.py adds FEED_MAX_SUBSCRIBERS threads on top of what admission
+# control needs, so viewers can never starve /process of threads
+feed_hub = FeedHub(
+    max_queue=int(os.getenv('FEED_QUEUE_SIZE', 100)),
+    max_subscribers=int(os.getenv('FEED_MAX_SUBSCRIBERS', 8)),
+    log=FeedLog(os.path.join(STATE_DIR, 'feed.db')) if STATE_BACKEND == 'shared' else None
+)
+broker_feed = BrokerFeed(
+    feed_hub, chat_gen,
+    min_delay=float(os.getenv('FEED_MIN_DELAY', 1.5)),
+    max_delay=float(os.getenv('FEED_MAX_DELAY', 4.5)),
+    lock_path=os.path.join(STATE_DIR, 'broker-feed.lock') if STATE_BACKEND == 'shared' else None
+)
+
+def after_fork():
+    """Per-process setup for a freshly forked worker (gunicorn post_fork)"""
+    # Model clients, pools and state handles rebuild themselves on a pid
+    # change; the chat generators would replay the parent's random sequence
+    for group in groups.groups():
+        group.chat_gen.rng.seed()
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -191,55 +2455,7 @@ HTML_TEMPLATE = """
     <title>WORKING Real Estate AI Demo</title>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { font-family: 'Segoe UI', sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; }
-        
-        .header { background: rgba(255,255,255,0.1); backdrop-filter: blur(10px); padding: 20px; color: white; text-align: center; }
-        .header h1 { font-size: 2rem; margin-bottom: 10px; }
-        .status { background: rgba(255,255,255,0.2); border-radius: 8px; padding: 8px; margin-top: 10px; }
-        .status.working { background: rgba(76, 175, 80, 0.3); }
-        
-        .container { max-width: 1200px; margin: 0 auto; padding: 20px; display: flex; gap: 20px; }
-        
-        .chat-section { flex: 2; background: white; border-radius: 15px; box-shadow: 0 10px 30px rgba(0,0,0,0.2); overflow: hidden; }
-        .chat-header { background: linear-gradient(90deg, #25D366, #128C7E); color: white; padding: 15px 20px; display: flex; justify-content: space-between; align-items: center; }
-        .chat-status { font-size: 0.9rem; }
-        
-        .messages { height: 400px; overflow-y: auto; padding: 15px; background: #f0f0f0; }
-        .message { margin: 10px 0; padding: 10px 15px; border-radius: 18px; max-width: 80%; word-wrap: break-word; animation: slideIn 0.3s ease; }
-        .message.broker { background: #DCF8C6; margin-left: auto; }
-        .message.user { background: #E1F5FE; margin-right: auto; }
-        .message.ai { background: #FFE0B2; margin-right: auto; border-left: 4px solid #FF9800; }
-        .message.system { background: #F3E5F5; margin-right: auto; font-style: italic; opacity: 0.8; }
-        
-        @keyframes slideIn { from { opacity: 0; transform: translateY(10px); } to { opacity: 1; transform: translateY(0); } }
-        
-        .msg-info { font-size: 0.8rem; font-weight: bold; margin-bottom: 5px; opacity: 0.7; }
-        .msg-time { font-size: 0.7rem; opacity: 0.5; text-align: right; margin-top: 5px; }
-        
-        .input-area { padding: 15px; background: white; display: flex; gap: 10px; }
-        .input-area input { flex: 1; padding: 12px 15px; border: 2px solid #e0e0e0; border-radius: 25px; outline: none; }
-        .input-area input:focus { border-color: #25D366; }
-        .input-area button { background: #25D366; color: white; border: none; padding: 12px 20px; border-radius: 25px; cursor: pointer; font-weight: bold; }
-        .input-area button:hover { background: #128C7E; }
-        
-        .ai-panel { flex: 1; background: white; border-radius: 15px; box-shadow: 0 10px 30px rgba(0,0,0,0.2); padding: 20px; }
-        
-        .ai-status { background: #E8F5E8; border-left: 4px solid #4CAF50; padding: 12px; border-radius: 8px; margin: 15px 0; }
-        .ai-status.inactive { background: #f5f5f5; border-color: #999; }
-        
-        .data-section { background: #f8f9fa; border-radius: 8px; padding: 15px; margin-top: 15px; }
-        .data-item { background: white; margin: 5px 0; padding: 8px; border-radius: 5px; border-left: 3px solid #4CAF50; font-size: 0.9rem; }
-        
-        .controls { text-align: center; padding: 15px; }
-        .btn { background: rgba(255,255,255,0.2); color: white; border: 1px solid rgba(255,255,255,0.3); padding: 10px 15px; margin: 5px; border-radius: 20px; cursor: pointer; transition: all 0.3s; }
-        .btn:hover { background: rgba(255,255,255,0.3); }
-        .btn.active { background: #4CAF50; border-color: #4CAF50; }
-        
-        .live-indicator { display: inline-block; width: 8px; height: 8px; background: #4CAF50; border-radius: 50%; animation: pulse 1.5s infinite; margin-right: 8px; }
-        @keyframes pulse { 0%, 100% { opacity: 1; } 50% { opacity: 0.5; } }
-    </style>
+    <link rel="stylesheet" href="{{ css_url }}">
 </head>
 <body>
     <div class="header">
@@ -300,243 +2516,563 @@ HTML_TEMPLATE = """
         <button class="btn" onclick="clearChat()">🗑️ Clear</button>
     </div>
 
-    <script>
-        let autoChatActive = true;
-        let messageCount = 0;
-        
-        function addMessage(content, sender, type) {
-            const container = document.getElementById('messages');
-            const div = document.createElement('div');
-            div.className = `message ${type}`;
-            
-            const time = new Date().toLocaleTimeString();
-            div.innerHTML = `
-                <div class="msg-info">${sender}</div>
-                <div>${content}</div>
-                <div class="msg-time">${time}</div>
-            `;
-            
-            container.appendChild(div);
-            container.scrollTop = container.scrollHeight;
-            messageCount++;
-            
-            document.getElementById('statMessages').textContent = messageCount;
-        }
-        
-        function updateAIStatus(status, active = true) {
-            const elem = document.getElementById('aiStatus');
-            elem.className = active ? 'ai-status' : 'ai-status inactive';
-            elem.innerHTML = `<strong>AI Monitor</strong><br><span>${status}</span>`;
-        }
-        
-        function updateExtractedData(data) {
-            const elem = document.getElementById('extractedData');
-            if (Object.keys(data).length === 0) {
-                elem.innerHTML = 'No data extracted yet...';
-                return;
-            }
-            
-            let html = '';
-            Object.values(data).forEach(item => {
-                if (item.data && item.data.extracted_count > 0) {
-                    const tenant = item.data.tenant || {};
-                    html += `<div class="data-item">`;
-                    html += `<strong>${item.sender}:</strong> `;
-                    if (tenant.name) html += `${tenant.name} `;
-                    if (tenant.phone) html += `${tenant.phone} `;
-                    if (tenant.salary) html += `${tenant.salary} NIS`;
-                    html += `</div>`;
-                }
-            });
-            elem.innerHTML = html || 'No business data yet...';
-        }
-        
-        async function sendMessage() {
-            const input = document.getElementById('messageInput');
-            const message = input.value.trim();
-            if (!message) return;
-            
-            addMessage(message, 'You', 'user');
-            input.value = '';
-            
-            await processMessage(message, 'You');
-        }
-        
-        async function processMessage(message, sender) {
-            try {
-                const response = await fetch('/process', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({message: message, sender: sender})
-                });
-                
-                const result = await response.json();
-                
-                updateAIStatus(result.status, result.decision.should_respond);
-                
-                if (result.ai_response) {
-                    setTimeout(() => {
-                        addMessage(result.ai_response, 'AI Assistant', 'ai');
-                        document.getElementById('statResponses').textContent = result.stats.responses;
-                    }, 1000);
-                }
-                
-                updateExtractedData(result.data_store);
-                document.getElementById('statExtractions').textContent = result.stats.extractions;
-                
-            } catch (error) {
-                console.error('Error:', error);
-                addMessage('❌ Connection error', 'System', 'system');
-            }
-        }
-        
-        async function generateBrokerMessage() {
-            if (!autoChatActive) return;
-            
-            try {
-                const response = await fetch('/simulate');
-                const result = await response.json();
-                
-                addMessage(result.message, result.broker, 'broker');
-                
-                setTimeout(() => {
-                    processMessage(result.message, result.broker);
-                }, 800);
-                
-                // Schedule next message
-                const delay = Math.random() * 3000 + 1500; // 1.5-4.5 seconds
-                setTimeout(generateBrokerMessage, delay);
-                
-            } catch (error) {
-                console.error('Auto-chat error:', error);
-                setTimeout(generateBrokerMessage, 5000); // Retry in 5 seconds
-            }
-        }
-        
-        function toggleAutoChat() {
-            const btn = document.getElementById('autoChatBtn');
-            const status = document.getElementById('autoStatus');
-            
-            autoChatActive = !autoChatActive;
-            
-            if (autoChatActive) {
-                btn.textContent = '⏸️ Auto-Chat ON';
-                btn.classList.add('active');
-                status.textContent = 'Auto-Chat: ACTIVE';
-                generateBrokerMessage();
-            } else {
-                btn.textContent = '▶️ Auto-Chat OFF';
-                btn.classList.remove('active');
-                status.textContent = 'Auto-Chat: STOPPED';
-            }
-        }
-        
-        async function sendTenantApp() {
-            const message = "New tenant application: Name: David Cohen, Phone: 054-123-4567, Salary: 15000 NIS, Employment: tech company";
-            addMessage(message, 'Sarah_TLV', 'broker');
-            setTimeout(() => processMessage(message, 'Sarah_TLV'), 500);
-        }
-        
-        async function sendCreditReq() {
-            const message = "Need urgent credit check for new applicant - can you help verify background?";
-            addMessage(message, 'Avi_RG', 'broker');
-            setTimeout(() => processMessage(message, 'Avi_RG'), 500);
-        }
-        
-        function clearChat() {
-            document.getElementById('messages').innerHTML = '';
-            document.getElementById('extractedData').innerHTML = 'No data extracted yet...';
-            document.getElementById('statMessages').textContent = '0';
-            document.getElementById('statResponses').textContent = '0';
-            document.getElementById('statExtractions').textContent = '0';
-            messageCount = 0;
-            updateAIStatus('Watching for business opportunities...');
-        }
-        
-        // START IMMEDIATELY
-        window.onload = function() {
-            addMessage('🚀 Welcome! Auto-chat starting NOW...', 'System', 'system');
-            addMessage('Watch AI respond ONLY to business messages, ignore casual chat!', 'System', 'system');
-            
-            // Start auto-chat immediately
-            setTimeout(generateBrokerMessage, 1000);
-        };
-    </script>
+    <script src="{{ js_url }}"></script>
 </body>
 </html>
 """
 
+index_page, static_assets = build_assets()
+
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return index_page.response()
+
+@app.route('/static/<name>')
+def static_asset(name):
+    asset = static_assets.get(name)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return asset.response()
+
+def run_pipeline(message, scan=None, sender=None, group=None, client_id=None):
+    """Monitor -> extract -> respond for one message; stats and store are left to commit_results"""
+    return run_pipeline_many([message], [sender], group, [client_id], [scan])[0]
+
+def run_pipeline_many(messages, senders=None, group=None, client_ids=None, scans=None, replies=True):
+    """run_pipeline over a chunk: scans fan out to the extraction pool, and the
+    chunk's decisions and replies reach the model together, not one call per item;
+    replies=False leaves ai_response empty and makes no reply calls"""
+    group = group or default_group
+    senders = senders or [None] * len(messages)
+    client_ids = client_ids or [None] * len(messages)
+    started = time.perf_counter()
+    results, items = _scan_chunk(messages, scans or [None] * len(messages))
+    decisions = monitor.decide_many([message for _, message, _ in items], [scan for _, _, scan in items])
+    
+    to_reply = []
+    for (i, message, scan), decision in zip(items, decisions):
+        context = context_key(senders[i], client_ids[i]) if group.sender_context is not None else None
+        # Fold in what this sender already told us, so "name" now and
+        # "phone + salary" next message still make a complete application
+        recent = None
+        if context is not None:
+            scan, recent = group.sender_context.merge(context, message, scan)
+            if recent and not decision['should_respond'] and monitor.has_complete_tenant(scan):
+                decision = {"should_respond": True, "confidence": 0.80,
+                            "reason": "Complete tenant data (split messages)", "source": "context"}
+        mark = time.perf_counter()
+        metrics.observe('monitor', mark - started)
+        
+        extracted_data = {}
+        duplicate = None
+        if decision['should_respond']:
+            extracted_data = extractor.extract(message, scan)
+            extracted = time.perf_counter()
+            metrics.observe('extract', extracted - mark)
+            if extracted_data.get('extracted_count', 0) > 0 and context is not None:
+                group.sender_context.clear(context)
+            if DEDUP_ENABLED and extracted_data.get('extracted_count', 0) > 0:
+                duplicate = group.store.find_duplicate(extracted_data['tenant'])
+                metrics.observe('dedup', time.perf_counter() - extracted)
+            if duplicate is not None:
+                # Already being screened - fold it in quietly instead of replying again
+                status = f"DUPLICATE: merged into record #{duplicate['id']}"
+            else:
+                # Replies built from carried context depend on more than this message
+                to_reply.append((i, message, extracted_data, not scan.get('carried')))
+                status = f"RESPONDED: {decision['reason']} (confidence: {decision['confidence']:.0%})"
+        else:
+            status = f"IGNORED: {decision['reason']} (confidence: {decision['confidence']:.0%})"
+        
+        results[i] = {
+            'decision': decision,
+            'extracted': extracted_data,
+            'ai_response': None,
+            'status': status,
+            'duplicate_of': duplicate['id'] if duplicate is not None else None,
+            # The stored record keeps every message the application came from
+            'source_message': "\n".join(recent) if recent and scan.get('carried') and extracted_data else None
+        }
+    
+    if replies and to_reply:
+        started_respond = time.perf_counter()
+        for (i, *_), reply in zip(to_reply, responder.generate_many([item[1:] for item in to_reply])):
+            results[i]['ai_response'] = reply
+        elapsed = time.perf_counter() - started_respond
+        for _ in to_reply:
+            metrics.observe('respond', elapsed)
+    return results
+
+def _scan_chunk(messages, scans):
+    """Guard and scan a chunk: skipped results by position, and (position, message, scan) for the rest"""
+    results = [None] * len(messages)
+    items = []
+    todo = []
+    for i, (message, scan) in enumerate(zip(messages, scans)):
+        if scan is not None:
+            items.append((i, message, scan))
+            continue
+        message, verdict = message_guard.check(message)
+        if verdict == 'rejected':
+            results[i] = _skipped_result("Message too large", "REJECTED")
+        # A whole chunk is worth fanning out; a single message only when it is long
+        elif extraction_pool and (len(messages) > 1 or extraction_pool.wants(message)):
+            todo.append((i, message))
+        else:
+            items.append((i, message, scanner.scan(message)))
+    if todo:
+        for (i, message), scan in zip(todo, extraction_pool.scan_many([message for _, message in todo])):
+            if scan is None:
+                results[i] = _skipped_result("Extraction timed out", "SKIPPED")
+            else:
+                items.append((i, message, scan))
+        # Context merges below must see each sender's messages in order
+        items.sort(key=lambda item: item[0])
+    return results, items
+
+def _skipped_result(reason, label):
+    decision = {"should_respond": False, "confidence": 1.0, "reason": reason, "source": "guard"}
+    return {
+        'decision': decision,
+        'extracted': {},
+        'ai_response': None,
+        'status': f"{label}: {reason}",
+        'duplicate_of': None,
+        'source_message': None
+    }
+
+def commit_results(items, group=None):
+    """Apply (message, sender, result) items to stats and the group's store in one step"""
+    group = group or default_group
+    started = time.perf_counter()
+    delta = {"messages": len(items), "responses": 0, "extractions": 0, "duplicates": 0}
+    new_records = []
+    
+    for message, sender, result in items:
+        group.log(message[:message_guard.max_chars], sender, result)
+        if not result['decision']['should_respond']:
+            continue
+        if result.get('duplicate_of') is None:
+            delta['responses'] += 1
+        extracted_data = result['extracted']
+        if extracted_data.get('extracted_count', 0) > 0:
+            stored = result.get('source_message') or message
+            new_records.append((stored[:message_guard.max_chars], sender, extracted_data))
+    
+    records = []
+    if new_records and DEDUP_ENABLED:
+        # Repeats inside one batch are caught here too, not only in run_pipeline
+        for (_, _, extracted_data), (record, created) in zip(new_records, group.store.upsert_many(new_records)):
+            if created:
+                delta['extractions'] += extracted_data['extracted_count']
+            else:
+                delta['duplicates'] += 1
+            records.append(record)
+    elif new_records:
+        records = group.store.add_many(new_records)
+        delta['extractions'] += sum(data['extracted_count'] for _, _, data in new_records)
+    group.stats.add(delta)
+    stats.add(delta)
+    metrics.count_reasons(result['decision'] for _, _, result in items)
+    metrics.observe('store', time.perf_counter() - started)
+    
+    return delta, records
+
+def publish_result(message, sender, result, origin, client_id=None, msg_type=None, group=None):
+    """Commit one pipeline result and broadcast it on the live feed"""
+    group = group or default_group
+    delta, records = commit_results([(message, sender, result)], group)
+    started = time.perf_counter()
+    feed_hub.publish({
+        'group': group.id,
+        'origin': origin,
+        'client_id': client_id,
+        'sender': sender,
+        'message': message[:message_guard.max_chars],
+        'type': msg_type,
+        'decision': result['decision'],
+        'ai_response': result['ai_response'],
+        'status': result['status'],
+        'records': records,
+        'cursor': group.store.last_id,
+        'stats': group.stats.snapshot()
+    })
+    metrics.observe('publish', time.perf_counter() - started)
+    return delta, records
+
+def request_group(data=None, create=True):
+    """Group named by the JSON body, ?group= or X-Group-Id; default group if none"""
+    group_id = parse_group((data or {}).get('group') or request.args.get('group')
+                           or request.headers.get('X-Group-Id'))
+    return groups.get(group_id, create=create)
+
+@app.errorhandler(GroupRouteError)
+def group_route_error(error):
+    body = {'error': str(error)}
+    if error.shard is not None:
+        # Tell the router or client where this group lives
+        body['shard'] = error.shard
+        if error.shard < len(SHARD_URLS):
+            body['shard_url'] = SHARD_URLS[error.shard]
+    return jsonify(body), error.status
+
+def admission_slot(messages):
+    """Admission for a request; any urgent message puts it in the priority lane"""
+    if admission is None:
+        return nullcontext()
+    return admission.admit(priority=any(scanner.is_priority(m[:message_guard.max_chars]) for m in messages))
+
+def busy_response(error):
+    """429 for a request shed by admission control"""
+    response = jsonify({'error': 'Server busy, please retry', 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
 
 @app.route('/process', methods=['POST'])
 def process_message():
     """Process message with AI"""
-    global stats
-    
     data = request.json
-    message = data.get('message', '')
-    sender = data.get('sender', 'Unknown')
+    message = str(data.get('message', ''))
+    sender = str(data.get('sender') or 'Unknown')
+    client_id = data.get('client_id')
+    client_id = str(client_id) if client_id else None
+    since = _parse_cursor(data.get('since'))
+    group = request_group(data)
     
-    stats['messages'] += 1
+    try:
+        with admission_slot([message]):
+            metrics.count_request('/process')
+            result = run_pipeline(message, sender=sender, group=group, client_id=client_id)
+            _, touched = publish_result(message, sender, result, origin='process', client_id=client_id, group=group)
+    except AdmissionRejected as e:
+        return busy_response(e)
     
-    # Monitor decision
-    decision = monitor.should_respond(message)
+    started = time.perf_counter()
+    response = jsonify({
+        'group': group.id,
+        'decision': result['decision'],
+        'ai_response': result['ai_response'],
+        'status': result['status'],
+        'duplicate_of': result['duplicate_of'],
+        **record_delta(group, since, touched),
+        'cursor': group.store.last_id,
+        'stats': group.stats.snapshot()
+    })
+    metrics.observe('serialize', time.perf_counter() - started)
+    return response
+
+@app.route('/process/batch', methods=['POST'])
+def process_batch():
+    """Process many messages in one round trip"""
+    data = request.json or {}
+    items = data.get('messages')
+    since = _parse_cursor(data.get('since'))
     
-    ai_response = None
-    extracted_data = {}
+    if not isinstance(items, list):
+        return jsonify({'error': "'messages' must be a list of {message, sender} objects"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f"Batch too large (max {BATCH_MAX_ITEMS} messages)"}), 413
     
-    if decision['should_respond']:
-        # Extract data
-        extracted_data = extractor.extract(message)
-        if extracted_data.get('extracted_count', 0) > 0:
-            stats['extractions'] += extracted_data['extracted_count']
-            
-            # Store data
-            timestamp = datetime.now().isoformat()
-            data_store[timestamp] = {
-                'message': message,
-                'sender': sender,
-                'data': extracted_data
+    group = request_group(data)
+    items = [item if isinstance(item, dict) else {} for item in items]
+    messages = [str(item.get('message', '')) for item in items]
+    senders = [str(item.get('sender') or 'Unknown') for item in items]
+    try:
+        with admission_slot(messages):
+            metrics.count_request('/process/batch', len(items))
+            batch = list(zip(messages, senders, run_pipeline_many(messages, senders, group)))
+            delta, touched = commit_results(batch, group)
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    started = time.perf_counter()
+    response = jsonify({
+        'results': [
+            {
+                'decision': result['decision'],
+                'ai_response': result['ai_response'],
+                'status': result['status'],
+                'duplicate_of': result['duplicate_of']
             }
-        
-        # Generate response
-        ai_response = responder.respond(message, extracted_data)
-        stats['responses'] += 1
-        
-        status = f"RESPONDED: {decision['reason']} (confidence: {decision['confidence']:.0%})"
-    else:
-        status = f"IGNORED: {decision['reason']} (confidence: {decision['confidence']:.0%})"
+            for _, _, result in batch
+        ],
+        'group': group.id,
+        'batch': delta,
+        **record_delta(group, since, touched),
+        'cursor': group.store.last_id,
+        'stats': group.stats.snapshot()
+    })
+    metrics.observe('serialize', time.perf_counter() - started)
+    return response
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Stream a chat export (NDJSON or WhatsApp text) through the pipeline"""
+    fmt = request.args.get('format', 'auto')
+    if fmt not in ('auto', 'ndjson', 'whatsapp'):
+        return jsonify({'error': "format must be auto, ndjson or whatsapp"}), 400
+    chunk_size = min(_parse_cursor(request.args.get('chunk'), 500) or 500, BATCH_MAX_ITEMS)
+    group = request_group()
+    
+    def progress():
+        messages = parse_chat_lines(iter_text_lines(request.stream), fmt)
+        last = None
+        for last in ingest_messages(messages, chunk_size, group):
+            yield json.dumps(last) + "\n"
+        yield json.dumps(dict(last or {}, done=True)) + "\n"
+    
+    return Response(stream_with_context(progress()), mimetype='application/x-ndjson')
+
+def _parse_cursor(value, default=0):
+    """Parse a client supplied record cursor, falling back to default"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+def record_delta(group, since, touched=()):
+    """Records after since, at most RECORD_DELTA_LIMIT, with the /data cursor for the rest.
+    Records this request merged a duplicate into keep their old id, so they come along too"""
+    page = group.store.since(since, RECORD_DELTA_LIMIT + 1)
+    more = len(page) > RECORD_DELTA_LIMIT
+    page = page[:RECORD_DELTA_LIMIT]
+    merged = list({record['id']: record for record in touched if record['id'] <= since}.values())
+    return {'records': merged + page, 'more': more, 'next_cursor': page[-1]['id'] if more else None}
+
+@app.route('/data')
+def data_snapshot():
+    """Paginated snapshot of extracted records"""
+    after = _parse_cursor(request.args.get('after'))
+    limit = min(_parse_cursor(request.args.get('limit'), 50) or 50, 500)
+    group = request_group()
+    
+    page = group.store.since(after, limit)
+    next_cursor = page[-1]['id'] if len(page) == limit else None
     
     return jsonify({
-        'decision': decision,
-        'ai_response': ai_response,
-        'status': status,
-        'data_store': data_store,
-        'stats': stats
+        'group': group.id,
+        'records': page,
+        'next_cursor': next_cursor,
+        'cursor': group.store.last_id,
+        'total': len(group.store)
+    })
+
+def _parse_time(value):
+    """Epoch seconds or an ISO 8601 timestamp to epoch seconds"""
+    try:
+        seconds = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+    if not math.isfinite(seconds):
+        raise ValueError(f"not a finite time: {value}")
+    return seconds
+
+@app.route('/tenants')
+def query_tenants():
+    """Extracted tenants filtered by sender, salary range and time, paged by id"""
+    args = request.args
+    try:
+        filters = {
+            'sender': args.get('sender') or None,
+            'min_salary': parse_salary(args['min_salary']) if 'min_salary' in args else None,
+            'max_salary': parse_salary(args['max_salary']) if 'max_salary' in args else None,
+            'start': _parse_time(args['since']) if 'since' in args else None,
+            'end': _parse_time(args['until']) if 'until' in args else None
+        }
+    except ValueError:
+        return jsonify({'error': "since/until must be epoch seconds or ISO 8601"}), 400
+    for bound in ('min_salary', 'max_salary'):
+        if bound in args and filters[bound] is None:
+            return jsonify({'error': f"{bound} must be a whole number (commas allowed)"}), 400
+    
+    after = _parse_cursor(args.get('after'))
+    limit = min(_parse_cursor(args.get('limit'), 50) or 50, 500)
+    group = request_group()
+    page = group.store.query(after=after, limit=limit, **filters)
+    
+    return jsonify({
+        'group': group.id,
+        'records': page,
+        'next_cursor': page[-1]['id'] if len(page) == limit else None,
+        'filters': {key: value for key, value in filters.items() if value is not None}
     })
 
 @app.route('/simulate')
 def simulate():
     """Generate broker message"""
-    broker, message, msg_type = chat_gen.get_message()
+    group = request_group()
+    broker, message, msg_type = group.chat_gen.get_message()
     return jsonify({
+        'group': group.id,
         'broker': broker,
         'message': message,
         'type': msg_type
     })
 
+@app.route('/stream')
+def stream():
+    """Live feed of processed messages as server-sent events (?group=* for every group)"""
+    group_id = None if request.args.get('group') == '*' else request_group().id
+    try:
+        subscriber = feed_hub.subscribe(group_id)
+    except FeedFull:
+        response = jsonify({'error': 'Too many live viewers, please retry', 'retry_after': 30})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    broker_feed.ensure_running()
+    
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.dropped:
+                try:
+                    payload = subscriber.queue.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {payload}\n\n"
+        finally:
+            feed_hub.unsubscribe(subscriber)
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/groups')
+def list_groups():
+    """Groups loaded on this shard"""
+    return jsonify({
+        'shard': groups.stats(),
+        'groups': [group.summary() for group in groups.groups()]
+    })
+
+@app.route('/groups/<group_id>')
+def group_summary(group_id):
+    """One group's counters and store stats"""
+    group = _existing_group(group_id)
+    if group is None:
+        return jsonify({'error': f"group {group_id} not found"}), 404
+    return jsonify(dict(group.summary(), store=group.store.stats(),
+                        sender_context=group.sender_context.stats() if group.sender_context else None))
+
+@app.route('/groups/<group_id>/history')
+def group_history(group_id):
+    """The group's most recent processed messages, newest last"""
+    group = _existing_group(group_id)
+    if group is None:
+        return jsonify({'error': f"group {group_id} not found"}), 404
+    limit = min(_parse_cursor(request.args.get('limit'), 50) or 50, GROUP_HISTORY)
+    history = list(group.history)
+    return jsonify({'group': group.id, 'messages': history[-limit:], 'total': len(history)})
+
+@app.route('/groups/<group_id>', methods=['DELETE'])
+def evict_group(group_id):
+    """Drop a group's state on this shard"""
+    group_id = parse_group(group_id)
+    # 421 if another shard owns it; loads a group only another worker has open
+    if _existing_group(group_id) is None or not groups.evict(group_id):
+        return jsonify({'error': f"group {group_id} not found"}), 404
+    if STATE_BACKEND == 'shared':
+        # Tenant data of a deleted group should not outlive the grace period
+        reaper = threading.Timer(GROUP_TOMBSTONE_GRACE, reap_tombstones)
+        reaper.daemon = True
+        reaper.start()
+    return jsonify({'group': group_id, 'evicted': True})
+
+def _existing_group(group_id):
+    """Loaded group, or one the shared backend still has on disk; None otherwise"""
+    group_id = parse_group(group_id)
+    on_disk = STATE_BACKEND == 'shared' and os.path.isdir(live_group_dir(group_id))
+    return groups.get(group_id, create=on_disk)
+
+@app.route('/shards')
+def shard_map():
+    """Ring layout, and the owning shard of each ?group= given"""
+    return jsonify({
+        'shard': SHARD_INDEX,
+        'shards': SHARD_COUNT,
+        'urls': SHARD_URLS,
+        'groups': {group_id: groups.owner(parse_group(group_id)) for group_id in request.args.getlist('group')}
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latencies, decision reasons and request rate for Prometheus"""
+    return Response(
+        metrics.render(
+            counters=dict(
+                stats.snapshot(),
+                messages_truncated=message_guard.counters['truncated'],
+                messages_rejected=message_guard.counters['rejected'],
+                extraction_timeouts=extraction_pool.counters['timeouts'] if extraction_pool else 0,
+                **({f'admission_{name}': value for name, value in admission.counters.items()} if admission else {})
+            ),
+            gauges=dict(
+                store_records=len(data_store),
+                groups_loaded=len(groups.groups()),
+                **({'admission_inflight': admission.inflight,
+                    'admission_queue_depth': admission.queue_depth()} if admission else {})
+            )
+        ),
+        mimetype='text/plain; version=0.0.4'
+    )
+
 @app.route('/health')
 def health():
     """Health check for deployment"""
     return jsonify({
         'status': 'healthy',
+        'pid': os.getpid(),
         'google_ai': monitor.has_api,
+        'state_backend': STATE_BACKEND,
+        'stats': stats.snapshot(),
+        'store': data_store.stats(),
+        'model': monitor.gateway.stats() if monitor.gateway else None,
+        'model_batches': monitor.batcher.stats() if monitor.batcher else None,
+        'cache': {'decisions': decision_cache.stats(), 'replies': reply_cache.stats()},
+        'feed': feed_hub.stats(),
+        'sender_context': sender_context.stats() if sender_context else None,
+        'groups': groups.stats(),
+        'admission': admission.stats() if admission else None,
+        'extraction': dict(message_guard.stats(), pool=extraction_pool.stats() if extraction_pool else None),
+        # ru_maxrss is KiB on Linux; this worker only
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
         'timestamp': datetime.now().isoformat()
     })
 
-if __name__ == '__main__':
+def ingest_file(path, fmt='auto', chunk_size=500, group_id=None):
+    """CLI backfill: python app.py ingest export.txt [--group ID]"""
+    if STATE_BACKEND != 'shared':
+        # The memory store dies with this process, so nothing would be kept
+        print("❌ ingest needs STATE_BACKEND=shared (and the server's STATE_DIR) to keep what it extracts; "
+              "for a memory-backed server, POST the file to its /ingest instead", file=sys.stderr)
+        sys.exit(2)
+    group = groups.get(parse_group(group_id))
+    stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        last = {}
+        for last in ingest_messages(parse_chat_lines(iter_text_lines(stream), fmt), chunk_size, group):
+            print(f"📥 {last['messages']} messages, {last['records']} records "
+                  f"({last['msgs_per_sec']} msg/s)", file=sys.stderr)
+        print(json.dumps(dict(last, done=True)))
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] == 'ingest':
+    import argparse
+    parser = argparse.ArgumentParser(prog='app.py ingest', description='Backfill a chat export')
+    parser.add_argument('path', help="NDJSON or WhatsApp export file, or - for stdin")
+    parser.add_argument('--format', default='auto', choices=['auto', 'ndjson', 'whatsapp'])
+    parser.add_argument('--chunk', type=int, default=500)
+    parser.add_argument('--group', help="broker group to ingest into (default group if omitted)")
+    args = parser.parse_args(sys.argv[2:])
+    ingest_file(args.path, args.format, args.chunk, args.group)
+
+elif __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print("🚀 WORKING Real Estate AI Demo Starting...")
     print(f"🌐 Port: {port}")
@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Real Estate AI Demo
+Run: python bench.py scanner|state|load|concurrency|overload|startup|shards [--url http://host:port] [--output results.json]
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+# ================================
+# LEGACY TWO-PASS BASELINE
+# ================================
+
+def legacy_should_respond(message):
+    """The monitor decision as it was before MessageScanner"""
+    msg_lower = message.lower()
+    if any(word in msg_lower for word in ['urgent credit', 'need verification', 'screen tenant']):
+        return {"should_respond": True, "confidence": 0.95, "reason": "Urgent request"}
+    has_name = bool(re.search(r'name[:\s]+[a-zA-Z\s]{3,}', message, re.IGNORECASE))
+    has_phone = bool(re.search(r'phone[:\s]*[0-9\-\s]{8,}', message, re.IGNORECASE))
+    has_salary = bool(re.search(r'salary[:\s]*[0-9,]+', message, re.IGNORECASE))
+    if sum([has_name, has_phone, has_salary]) >= 2:
+        return {"should_respond": True, "confidence": 0.85, "reason": "Complete tenant data"}
+    if 'credit' in msg_lower and ('check' in msg_lower or 'verify' in msg_lower):
+        return {"should_respond": True, "confidence": 0.80, "reason": "Credit check request"}
+    return {"should_respond": False, "confidence": 0.90, "reason": "Casual conversation"}
+
+def legacy_extract(message):
+    """The extractor as it was before MessageScanner"""
+    tenant = {}
+    name_match = re.search(r'name[:\s]+([a-zA-Z\s]{3,30})', message, re.IGNORECASE)
+    if name_match:
+        tenant['name'] = name_match.group(1).strip()
+    phone_match = re.search(r'phone[:\s]*([0-9\-\s]{8,20})', message, re.IGNORECASE)
+    if phone_match:
+        tenant['phone'] = phone_match.group(1).strip()
+    salary_match = re.search(r'salary[:\s]*([0-9,]+)', message, re.IGNORECASE)
+    if salary_match:
+        tenant['salary'] = salary_match.group(1)
+    email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', message)
+    if email_match:
+        tenant['email'] = email_match.group(1)
+    return {"tenant": tenant, "extracted_count": len([v for v in tenant.values() if v])}
+
+def legacy_pipeline(message):
+    decision = legacy_should_respond(message)
+    extracted = legacy_extract(message) if decision['should_respond'] else {}
+    return decision, extracted
+
+def fused_pipeline(message):
+    scan = app.scanner.scan(message)
+    decision = app.monitor.should_respond(message, scan)
+    extracted = app.extractor.extract(message, scan) if decision['should_respond'] else {}
+    return decision, extracted
+
+# ================================
+# SCENARIOS
+# ================================
+
+def generate_workload(count, seed, weights=None):
+    """Deterministic {sender, message, type} items from BrokerChatGenerator"""
+    gen = app.BrokerChatGenerator(seed=seed, weights=weights)
+    workload = []
+    for _ in range(count):
+        broker, message, msg_type = gen.get_message()
+        workload.append({'sender': broker, 'message': message, 'type': msg_type})
+    return workload
+
+def broker_messages(count, seed, weights=None):
+    return [item['message'] for item in generate_workload(count, seed, weights)]
+
+def parse_weights(text):
+    """'casual=70,business=20,...' -> dict, for --weights"""
+    if not text:
+        return None
+    categories = app.BrokerChatGenerator().messages
+    weights = {}
+    for part in text.split(','):
+        name, _, value = part.partition('=')
+        name = name.strip()
+        if name not in categories:
+            raise argparse.ArgumentTypeError(f"unknown category {name!r}, expected one of {', '.join(categories)}")
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"{name} needs a number, got {value!r}") from None
+        if not math.isfinite(weights[name]) or weights[name] < 0:
+            raise argparse.ArgumentTypeError(f"{name} needs a weight >= 0, got {value!r}")
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError("at least one weight must be above 0")
+    return weights
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def latency_report(latencies, wall, messages):
+    latencies = sorted(latencies)
+    return {
+        'messages': messages,
+        'requests': len(latencies),
+        'wall_s': round(wall, 3),
+        'msgs_per_sec': round(messages / wall, 1) if wall else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3)
+        }
+    }
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def server_peak_rss_mb(url):
+    """Peak RSS of the server worker that answers /health, None if it does not say"""
+    import requests
+
+    try:
+        return requests.get(url + '/health', timeout=10).json().get('peak_rss_mb')
+    except (requests.RequestException, ValueError):
+        return None
+
+def _requests_for(workload, batch_size):
+    """Split the workload into (path, json body, message count) requests"""
+    if batch_size <= 1:
+        return [('/process', {'message': item['message'], 'sender': item['sender']}, 1)
+                for item in workload]
+    return [('/process/batch', {'messages': [{'message': i['message'], 'sender': i['sender']}
+                                             for i in workload[start:start + batch_size]]},
+             len(workload[start:start + batch_size]))
+            for start in range(0, len(workload), batch_size)]
+
+def replay_inprocess(workload, batch_size=1, concurrency=1):
+    """Replay through the Flask test client; stage breakdown comes from app.metrics"""
+    requests_ = _requests_for(workload, batch_size)
+    client = app.app.test_client()
+
+    def send(req):
+        path, body, _ = req
+        start = time.perf_counter()
+        response = client.post(path, json=body)
+        elapsed = time.perf_counter() - start
+        # 429 is admission control shedding load, anything else is a bug
+        if response.status_code not in (200, 429):
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        return elapsed, response.status_code
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(send, requests_))
+    else:
+        results = [send(req) for req in requests_]
+    report = latency_report([elapsed for elapsed, _ in results], time.perf_counter() - start, len(workload))
+    report['status_codes'] = count_codes(code for _, code in results)
+    report['stages'] = app.metrics.summary()
+    return report
+
+def count_codes(codes):
+    counts = {}
+    for code in codes:
+        counts[str(code)] = counts.get(str(code), 0) + 1
+    return counts
+
+def http_session(concurrency):
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def replay_http(workload, url, batch_size=1, concurrency=8, timeout=30):
+    """Replay against a running server; stage breakdown is scraped from /metrics"""
+    url = url.rstrip('/')
+    requests_ = _requests_for(workload, batch_size)
+    session = http_session(concurrency)
+
+    def send(req):
+        path, body, _ = req
+        start = time.perf_counter()
+        response = session.post(url + path, json=body, timeout=timeout)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code
+
+    before = scrape_stages(session, url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, requests_))
+    wall = time.perf_counter() - start
+    after = scrape_stages(session, url)
+
+    report = latency_report([elapsed for elapsed, _ in results], wall, len(workload))
+    report['status_codes'] = count_codes(code for _, code in results)
+    report['stages'] = {
+        stage: {
+            'count': after[stage]['count'] - before.get(stage, {}).get('count', 0),
+            'mean_ms': round((after[stage]['sum'] - before.get(stage, {}).get('sum', 0)) * 1000 /
+                             max(after[stage]['count'] - before.get(stage, {}).get('count', 0), 1), 4)
+        }
+        for stage in after
+    }
+    return report
+
+STAGE_LINE = re.compile(r'_stage_seconds_(sum|count)\{stage="([^"]+)"\} ([0-9.e+-]+)')
+
+def scrape_stages(session, url):
+    """Per-stage sum/count from a server's /metrics (one worker's view)"""
+    stages = {}
+    try:
+        text = session.get(url + '/metrics', timeout=10).text
+    except Exception:
+        return stages
+    for kind, stage, value in STAGE_LINE.findall(text):
+        stages.setdefault(stage, {'sum': 0.0, 'count': 0})[kind] = float(value)
+    return stages
+
+def time_per_message(func, messages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages) * 1e6
+
+def bench_scanner(args):
+    """Per-message cost of the fused scanner vs the legacy two-pass path"""
+    messages = broker_messages(args.messages, args.seed)
+
+    mismatches = sum(legacy_pipeline(m) != fused_pipeline(m) for m in messages)
+    legacy_us = time_per_message(legacy_pipeline, messages, args.repeat)
+    fused_us = time_per_message(fused_pipeline, messages, args.repeat)
+
+    return {
+        'scenario': 'scanner',
+        'messages': len(messages),
+        'mismatches': mismatches,
+        'legacy_us_per_msg': round(legacy_us, 3),
+        'fused_us_per_msg': round(fused_us, 3),
+        'speedup': round(legacy_us / fused_us, 2)
+    }
+
+def _state_worker(backend, state_dir, ops, results):
+    stats, store = app.create_state(backend, state_dir=state_dir)
+    data = {'tenant': {'name': 'Dana Cohen', 'phone': '054-1234567'}, 'extracted_count': 2}
+    start = time.perf_counter()
+    for i in range(ops):
+        stats.add({'messages': 1, 'responses': 1, 'extractions': 2})
+        store.add(f'Name: Dana Cohen phone 054-1234567 #{i}', 'Sarah_TLV', data)
+    results.put(time.perf_counter() - start)
+
+def bench_state(args):
+    """In-process dict state vs the shared mmap + SQLite backend across processes"""
+    report = {'scenario': 'state', 'processes': args.processes, 'ops_per_process': args.ops}
+    ctx = multiprocessing.get_context('fork')
+
+    for backend in ('memory', 'shared'):
+        state_dir = tempfile.mkdtemp(prefix='bench-state-')
+        try:
+            results = ctx.Queue()
+            procs = [ctx.Process(target=_state_worker, args=(backend, state_dir, args.ops, results))
+                     for _ in range(args.processes)]
+            start = time.perf_counter()
+            for proc in procs:
+                proc.start()
+            elapsed = [results.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+            wall = time.perf_counter() - start
+            
+            # What a fresh worker sees after everyone finished
+            stats, store = app.create_state(backend, state_dir=state_dir)
+            expected = args.processes * args.ops
+            report[backend] = {
+                'ops_per_sec': round(expected / wall),
+                'slowest_worker_s': round(max(elapsed), 3),
+                'messages_seen': stats.snapshot()['messages'],
+                'records_seen': len(store),
+                'consistent': stats.snapshot()['messages'] == expected and len(store) == expected
+            }
+        finally:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+    return report
+
+def bench_load(args):
+    """Seeded BrokerChatGenerator traffic replayed in-process or against --url"""
+    weights = args.weights
+    workload = generate_workload(args.messages, args.seed, weights)
+    report = {
+        'scenario': 'load',
+        'target': args.url or 'in-process',
+        'seed': args.seed,
+        'weights': weights or app.BrokerChatGenerator.DEFAULT_WEIGHTS,
+        'batch_size': args.batch_size,
+        'concurrency': args.concurrency
+    }
+    if args.url:
+        report.update(replay_http(workload, args.url, args.batch_size, args.concurrency))
+        # This process only ran the client; the server's memory is whatever worker answers /health
+        report['client_peak_rss_mb'] = peak_rss_mb()
+        report['server_peak_rss_mb'] = server_peak_rss_mb(args.url)
+    else:
+        report.update(replay_inprocess(workload, args.batch_size, args.concurrency))
+        report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+# ================================
+# SERVING MODES
+# ================================
+
+class FakeReply:
+    def __init__(self, text):
+        self.text = text
+
+class SlowFakeModel:
+    """Stands in for Gemini: fixed latency, canned answers"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        if 'JSON array' in prompt:
+            count = len(re.findall(r'^\d+\. ', prompt, re.MULTILINE))
+            return FakeReply(json.dumps([{'id': i, 'should_respond': True, 'confidence': 0.8,
+                                          'reason': 'Fake model'} for i in range(1, count + 1)]))
+        if 'Answer only with JSON' in prompt:
+            return FakeReply('{"should_respond": true, "confidence": 0.8, "reason": "Fake model"}')
+        return FakeReply('Thanks, on it!')
+
+def slow_model_app():
+    """gunicorn 'bench:slow_model_app()' - the app with a slow fake model wired in"""
+    model = SlowFakeModel(float(os.getenv('BENCH_MODEL_LATENCY', 0.2)))
+    app.monitor = app.WorkingMonitorAgent(app.scanner, model=model)
+    app.responder = app.WorkingResponseAgent(app.monitor.gateway)
+    return app.app
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _start_gunicorn(worker_class, threads, latency, target='bench:slow_model_app()', port=None, **extra_env):
+    import requests
+
+    port = port or _free_port()
+    # gunicorn quietly turns sync into gthread when threads > 1
+    threads = 1 if worker_class == 'sync' else threads
+    env = dict(os.environ, BENCH_MODEL_LATENCY=str(latency), GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_THREADS=str(threads), WEB_CONCURRENCY='1', MODEL_WORKERS=str(threads),
+               MODEL_QUEUE_DEPTH=str(threads * 4), PORT=str(port))
+    env.update(extra_env)
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', target, '--config', 'gunicorn.conf.py'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url + '/health', timeout=1)
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.01)
+    proc.kill()
+    raise RuntimeError(f"gunicorn ({worker_class}) did not start")
+
+def bench_concurrency(args):
+    """sync vs gthread workers as client concurrency grows, with a slow model"""
+    report = {'scenario': 'concurrency', 'model_latency_s': args.model_latency,
+              'threads': args.threads, 'messages': args.messages}
+    levels = [int(level) for level in args.levels.split(',')]
+    workload = generate_workload(args.messages, args.seed, args.weights)
+
+    for worker_class in ('sync', 'gthread'):
+        # Admission control off, so both see the same unbounded load
+        proc, url = _start_gunicorn(worker_class, args.threads, args.model_latency, ADMISSION_MAX_INFLIGHT='0')
+        try:
+            report[worker_class] = {}
+            for level in levels:
+                run = replay_http(workload, url, concurrency=level)
+                report[worker_class][str(level)] = {
+                    'msgs_per_sec': run['msgs_per_sec'],
+                    'p50_ms': run['latency_ms']['p50'],
+                    'p95_ms': run['latency_ms']['p95'],
+                    'status_codes': run['status_codes']
+                }
+        finally:
+            proc.terminate()
+            proc.wait(timeout=15)
+
+    return report
+
+def replay_lanes(workload, url, concurrency, timeout=60):
+    """Fire /process at a server and report outcomes per admission lane"""
+    session = http_session(concurrency)
+    lanes = [app.scanner.is_priority(item['message']) for item in workload]
+
+    def send(item):
+        start = time.perf_counter()
+        response = session.post(url + '/process', json={'message': item['message'], 'sender': item['sender']},
+                                timeout=timeout)
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, workload))
+    wall = time.perf_counter() - start
+
+    report = {'wall_s': round(wall, 3),
+              'goodput_msgs_per_sec': round(sum(code == 200 for _, code in results) / wall, 1)}
+    for lane, name in ((True, 'urgent'), (False, 'normal')):
+        outcomes = [result for result, urgent in zip(results, lanes) if urgent == lane]
+        served = sorted(elapsed for elapsed, code in outcomes if code == 200)
+        report[name] = {
+            'requests': len(outcomes),
+            'status_codes': count_codes(code for _, code in outcomes),
+            'served_p50_ms': round(percentile(served, 50) * 1000, 1) if served else None,
+            'served_p95_ms': round(percentile(served, 95) * 1000, 1) if served else None
+        }
+    try:
+        report['admission'] = session.get(url + '/health', timeout=10).json().get('admission')
+    except Exception:
+        report['admission'] = None
+    return report
+
+def bench_overload(args):
+    """More clients than the server can hold, with and without admission control"""
+    # Default: four clients per gthread thread, enough to saturate either way
+    concurrency = args.concurrency if args.concurrency > 1 else args.threads * 4
+    inflight = max(args.threads // 2, 1)
+    queue = max(args.threads // 4, 1)
+    workload = generate_workload(args.messages, args.seed, args.weights)
+    report = {'scenario': 'overload', 'model_latency_s': args.model_latency, 'threads': args.threads,
+              'concurrency': concurrency, 'messages': args.messages,
+              'urgent_messages': sum(app.scanner.is_priority(item['message']) for item in workload)}
+
+    modes = (
+        ('unbounded', {'ADMISSION_MAX_INFLIGHT': '0'}),
+        ('admission', {'ADMISSION_MAX_INFLIGHT': str(inflight), 'ADMISSION_MAX_QUEUE': str(queue)})
+    )
+    for mode, env in modes:
+        # Model concurrency matches what admission lets in, as a real quota would
+        proc, url = _start_gunicorn('gthread', args.threads, args.model_latency,
+                                    MODEL_WORKERS=str(inflight), **env)
+        try:
+            report[mode] = replay_lanes(workload, url, concurrency)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=15)
+
+    return report
+
+IMPORT_SNIPPET = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "print(time.perf_counter() - started, 'google.generativeai' in sys.modules)"
+)
+
+def _pss_mb(pid):
+    """Proportional set size of pid and its children (Linux), shared pages split between them"""
+    total = 0
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids = [pid] + [int(child) for child in f.read().split()]
+        for each in pids:
+            with open(f'/proc/{each}/smaps_rollup') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('Pss:'))
+    except (OSError, StopIteration):
+        return None
+    return round(total / 1024, 1)
+
+def bench_startup(args):
+    """Import time, and time to first response with and without --preload"""
+    import requests
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports = []
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=here, capture_output=True,
+                             text=True, check=True).stdout.splitlines()[-1].split()
+        imports.append(float(out[0]))
+    report = {'scenario': 'startup', 'workers': args.processes,
+              'import_ms': {'min': round(min(imports) * 1000, 1),
+                            'median': round(sorted(imports)[len(imports) // 2] * 1000, 1)},
+              'genai_imported_at_startup': out[1] == 'True'}
+
+    for preload in ('0', '1'):
+        runs = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            proc, url = _start_gunicorn('gthread', args.threads, 0, target='app:app', GUNICORN_PRELOAD=preload,
+                                        WEB_CONCURRENCY=str(args.processes))
+            try:
+                ready = time.perf_counter() - started
+                first = time.perf_counter()
+                requests.post(url + '/process', json={'message': 'Name: Dan Levi, phone 052-1234567, salary 15,000',
+                                                      'sender': 'bench'}, timeout=30)
+                first = time.perf_counter() - first
+                # Give every worker time to boot and touch its pages
+                time.sleep(1.0)
+                for _ in range(args.processes * 4):
+                    requests.get(url + '/', timeout=10)
+                runs.append((ready, first, _pss_mb(proc.pid)))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=15)
+        report['preload' if preload == '1' else 'per_worker_import'] = {
+            'ready_ms': round(sorted(r[0] for r in runs)[len(runs) // 2] * 1000, 1),
+            'first_process_ms': round(sorted(r[1] for r in runs)[len(runs) // 2] * 1000, 1),
+            'time_to_first_response_ms': round(sorted(r[0] + r[1] for r in runs)[len(runs) // 2] * 1000, 1),
+            'pss_mb': runs[-1][2]
+        }
+
+    return report
+
+def bench_shards(args):
+    """Throughput as broker groups spread over 1..N shard instances"""
+    shard_levels = [int(level) for level in args.shards.split(',')]
+    concurrency = args.concurrency if args.concurrency > 1 else 32
+    group_ids = [f'group-{i}' for i in range(args.groups)]
+    # Each group gets its own seeded chat, interleaved like live traffic
+    per_group = max(args.messages // args.groups, 1)
+    chats = [generate_workload(per_group, args.seed + i, args.weights) for i in range(args.groups)]
+    workload = [dict(chats[g][n], group=group_ids[g]) for n in range(per_group) for g in range(args.groups)]
+    report = {'scenario': 'shards', 'model_latency_s': args.model_latency, 'groups': args.groups,
+              'messages': len(workload), 'concurrency': concurrency}
+
+    for shards in shard_levels:
+        ring = app.ShardRing(shards)
+        ports = [_free_port() for _ in range(shards)]
+        urls = ','.join(f'http://127.0.0.1:{port}' for port in ports)
+        procs = []
+        try:
+            for index in range(shards):
+                # One single-worker instance per shard, each with its own model quota
+                procs.append(_start_gunicorn('gthread', args.threads, args.model_latency, SHARD_COUNT=str(shards),
+                                             SHARD_INDEX=str(index), SHARD_URLS=urls, ADMISSION_MAX_INFLIGHT='0',
+                                             MODEL_WORKERS='4', port=ports[index])[0])
+            session = http_session(concurrency)
+
+            def send(item):
+                url = f'http://127.0.0.1:{ports[ring.shard_for(item["group"])]}/process'
+                start = time.perf_counter()
+                response = session.post(url, json={'message': item['message'], 'sender': item['sender'],
+                                                   'group': item['group']}, timeout=60)
+                return time.perf_counter() - start, response.status_code
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(send, workload))
+            run = latency_report([elapsed for elapsed, _ in results], time.perf_counter() - start, len(workload))
+            report[str(shards)] = {
+                'msgs_per_sec': run['msgs_per_sec'],
+                'p50_ms': run['latency_ms']['p50'],
+                'p95_ms': run['latency_ms']['p95'],
+                'status_codes': count_codes(code for _, code in results),
+                'groups_per_shard': [sum(ring.shard_for(g) == i for g in group_ids) for i in range(shards)]
+            }
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.wait(timeout=15)
+
+    return report
+
+SCENARIOS = {
+    'scanner': bench_scanner,
+    'state': bench_state,
+    'load': bench_load,
+    'concurrency': bench_concurrency,
+    'overload': bench_overload,
+    'startup': bench_startup,
+    'shards': bench_shards
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Real Estate AI Demo benchmarks')
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--weights', type=parse_weights, help="category weights, e.g. casual=70,business=20,tenant_app=8,credit_req=2")
+    parser.add_argument('--url', help="replay against a running server instead of in-process")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=1, help="messages per request; >1 uses /process/batch")
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    parser.add_argument('--levels', default='1,4,16', help="client concurrency levels for 'concurrency'")
+    parser.add_argument('--threads', type=int, default=32, help="gthread threads per worker for 'concurrency'/'overload'")
+    parser.add_argument('--model-latency', type=float, default=0.2)
+    parser.add_argument('--shards', default='1,2,4', help="shard counts for 'shards'")
+    parser.add_argument('--groups', type=int, default=24, help="broker groups for 'shards'")
+    args = parser.parse_args()
+
+    report = SCENARIOS[args.scenario](args)
+    report['python'] = sys.version.split()[0]
+    report['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+let autoChatActive = true;
+let feed = null;
+const clientId = Math.random().toString(36).slice(2);
+let messageCount = 0;
+let recordCursor = 0;
+let extractedRecords = {};
+let catchingUp = false;
+let renderPending = false;
+const RECORD_WINDOW = 100; // Newest records kept and shown; /data and /tenants have the rest
+
+// Messages, senders and model text come from other clients: never innerHTML them
+function textDiv(text, className) {
+    const div = document.createElement('div');
+    if (className) div.className = className;
+    div.textContent = text;
+    return div;
+}
+
+function addMessage(content, sender, type) {
+    const container = document.getElementById('messages');
+    const div = document.createElement('div');
+    div.className = `message ${type}`;
+    
+    const time = new Date().toLocaleTimeString();
+    div.append(textDiv(sender, 'msg-info'), textDiv(content), textDiv(time, 'msg-time'));
+    
+    container.appendChild(div);
+    container.scrollTop = container.scrollHeight;
+    messageCount++;
+    
+    document.getElementById('statMessages').textContent = messageCount;
+}
+
+function updateAIStatus(status, active = true) {
+    const elem = document.getElementById('aiStatus');
+    elem.className = active ? 'ai-status' : 'ai-status inactive';
+    const title = document.createElement('strong');
+    title.textContent = 'AI Monitor';
+    const text = document.createElement('span');
+    text.textContent = status;
+    elem.replaceChildren(title, document.createElement('br'), text);
+}
+
+function mergeRecords(records) {
+    (records || []).forEach(item => {
+        extractedRecords[item.id] = item;
+        recordCursor = Math.max(recordCursor, item.id);
+    });
+    // Integer keys iterate in ascending order, so the oldest come first
+    const ids = Object.keys(extractedRecords);
+    ids.slice(0, Math.max(ids.length - RECORD_WINDOW, 0)).forEach(id => delete extractedRecords[id]);
+}
+
+function updateExtractedData(records, cursor) {
+    // Merge the delta, then fetch whatever the server has that it did not carry
+    // (batch and ingest records are never broadcast on the feed)
+    mergeRecords(records);
+    if (cursor !== undefined && cursor > recordCursor) catchUp(cursor);
+    renderExtractedData();
+}
+
+async function catchUp(target) {
+    // Only the newest window is ever shown, so skip straight to it instead of paging everything
+    if (catchingUp) return;
+    catchingUp = true;
+    try {
+        const after = Math.max(recordCursor, target - RECORD_WINDOW);
+        const response = await fetch(`/data?after=${after}&limit=${RECORD_WINDOW}`);
+        const page = await response.json();
+        mergeRecords(page.records);
+        // Anything up to target that is still missing was evicted or is outside the window
+        recordCursor = Math.max(recordCursor, target);
+        renderExtractedData();
+    } catch (error) {
+        console.error('Catch-up failed:', error);
+    } finally {
+        catchingUp = false;
+    }
+}
+
+async function loadLatestRecords() {
+    // Start from the server's cursor rather than 0, with just the newest window
+    try {
+        const response = await fetch('/data?limit=1');
+        const snapshot = await response.json();
+        if (snapshot.cursor > recordCursor) await catchUp(snapshot.cursor);
+    } catch (error) {
+        console.error('Loading records failed:', error);
+    }
+}
+
+function renderExtractedData() {
+    // Feed events can arrive in bursts: rebuild at most once per frame
+    if (renderPending) return;
+    renderPending = true;
+    requestAnimationFrame(() => {
+        renderPending = false;
+        drawExtractedData();
+    });
+}
+
+function drawExtractedData() {
+    const data = extractedRecords;
+    const elem = document.getElementById('extractedData');
+    if (Object.keys(data).length === 0) {
+        elem.textContent = 'No data extracted yet...';
+        return;
+    }
+    
+    const items = [];
+    Object.values(data).forEach(item => {
+        if (item.data && item.data.extracted_count > 0) {
+            const tenant = item.data.tenant || {};
+            const div = document.createElement('div');
+            div.className = 'data-item';
+            const sender = document.createElement('strong');
+            sender.textContent = `${item.sender}:`;
+            const details = [tenant.name, tenant.phone, tenant.salary && `${tenant.salary} NIS`].filter(Boolean);
+            div.append(sender, ' ' + details.join(' '));
+            items.push(div);
+        }
+    });
+    if (items.length) {
+        elem.replaceChildren(...items);
+    } else {
+        elem.textContent = 'No business data yet...';
+    }
+}
+
+async function sendMessage() {
+    const input = document.getElementById('messageInput');
+    const message = input.value.trim();
+    if (!message) return;
+    
+    addMessage(message, 'You', 'user');
+    input.value = '';
+    
+    await processMessage(message, 'You');
+}
+
+function showResult(result) {
+    updateAIStatus(result.status, result.decision.should_respond);
+    
+    if (result.ai_response) {
+        setTimeout(() => {
+            addMessage(result.ai_response, 'AI Assistant', 'ai');
+            document.getElementById('statResponses').textContent = result.stats.responses;
+        }, 1000);
+    }
+    
+    updateExtractedData(result.records, result.cursor);
+    document.getElementById('statExtractions').textContent = result.stats.extractions;
+}
+
+async function processMessage(message, sender) {
+    try {
+        const response = await fetch('/process', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({message: message, sender: sender, since: recordCursor, client_id: clientId})
+        });
+        
+        if (response.status === 429) {
+            // Shed by admission control: there is no decision to show
+            const retryAfter = response.headers.get('Retry-After') || 1;
+            addMessage(`⏳ Server busy - try again in ${retryAfter}s`, 'System', 'system');
+            return;
+        }
+        showResult(await response.json());
+        
+    } catch (error) {
+        console.error('Error:', error);
+        addMessage('❌ Connection error', 'System', 'system');
+    }
+}
+
+function startLiveFeed() {
+    // The server processes every broker message once and pushes it here
+    if (feed) return;
+    feed = new EventSource('/stream');
+    
+    feed.onmessage = (event) => {
+        const result = JSON.parse(event.data);
+        if (result.client_id === clientId) return; // Already shown from our own POST
+        
+        addMessage(result.message, result.sender, 'broker');
+        setTimeout(() => showResult(result), 800);
+    };
+    
+    feed.onerror = () => {
+        if (feed.readyState !== EventSource.CLOSED) {
+            console.error('Live feed interrupted - reconnecting...');
+            return;
+        }
+        // Refused (503 when every viewer slot is taken): EventSource gives up, so retry later
+        console.error('Live feed unavailable - retrying in 30s');
+        feed = null;
+        setTimeout(() => { if (autoChatActive) startLiveFeed(); }, 30000);
+    };
+}
+
+function stopLiveFeed() {
+    if (feed) {
+        feed.close();
+        feed = null;
+    }
+}
+
+function toggleAutoChat() {
+    const btn = document.getElementById('autoChatBtn');
+    const status = document.getElementById('autoStatus');
+    
+    autoChatActive = !autoChatActive;
+    
+    if (autoChatActive) {
+        btn.textContent = '⏸️ Auto-Chat ON';
+        btn.classList.add('active');
+        status.textContent = 'Auto-Chat: ACTIVE';
+        startLiveFeed();
+    } else {
+        btn.textContent = '▶️ Auto-Chat OFF';
+        btn.classList.remove('active');
+        status.textContent = 'Auto-Chat: STOPPED';
+        stopLiveFeed();
+    }
+}
+
+async function sendTenantApp() {
+    const message = "New tenant application: Name: David Cohen, Phone: 054-123-4567, Salary: 15000 NIS, Employment: tech company";
+    addMessage(message, 'Sarah_TLV', 'broker');
+    setTimeout(() => processMessage(message, 'Sarah_TLV'), 500);
+}
+
+async function sendCreditReq() {
+    const message = "Need urgent credit check for new applicant - can you help verify background?";
+    addMessage(message, 'Avi_RG', 'broker');
+    setTimeout(() => processMessage(message, 'Avi_RG'), 500);
+}
+
+function clearChat() {
+    document.getElementById('messages').innerHTML = '';
+    document.getElementById('extractedData').textContent = 'No data extracted yet...';
+    extractedRecords = {};
+    document.getElementById('statMessages').textContent = '0';
+    document.getElementById('statResponses').textContent = '0';
+    document.getElementById('statExtractions').textContent = '0';
+    messageCount = 0;
+    updateAIStatus('Watching for business opportunities...');
+}
+
+// START IMMEDIATELY
+window.onload = function() {
+    addMessage('🚀 Welcome! Auto-chat starting NOW...', 'System', 'system');
+    addMessage('Watch AI respond ONLY to business messages, ignore casual chat!', 'System', 'system');
+    
+    loadLatestRecords();
+    
+    // Start auto-chat immediately
+    startLiveFeed();
+    document.getElementById('autoStatus').textContent = 'Auto-Chat: ACTIVE';
+};
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Tests never talk to Gemini; app.py falls back to rules without a key
+os.environ.pop('GOOGLE_API_KEY', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def client():
+    """Flask test client for the app"""
+    import app
+    return app.app.test_client()
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import app
+
+
+class Holder:
+    """A request holding (or waiting for) a slot in its own thread until released"""
+
+    def __init__(self, controller, priority=False):
+        self.admitted = threading.Event()
+        self.release = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(controller, priority), daemon=True)
+        self.thread.start()
+
+    def _run(self, controller, priority):
+        try:
+            with controller.admit(priority):
+                self.admitted.set()
+                self.release.wait(5)
+        except app.AdmissionRejected as e:
+            self.error = e
+
+    def finish(self):
+        self.release.set()
+        self.thread.join(5)
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_admits_up_to_the_limit_then_queues_and_hands_over():
+    controller = app.AdmissionController(max_inflight=1, max_queue=1, queue_timeout=5)
+    first = Holder(controller)
+    assert first.admitted.wait(5)
+    second = Holder(controller)
+    wait_for(lambda: controller.queue_depth() == 1)
+    assert not second.admitted.is_set()
+
+    first.finish()
+    assert second.admitted.wait(5)
+    assert controller.inflight == 1
+    second.finish()
+    assert controller.inflight == 0 and controller.queue_depth() == 0
+
+
+def test_full_lane_sheds_with_retry_after():
+    controller = app.AdmissionController(max_inflight=1, max_queue=1, queue_timeout=5)
+    first = Holder(controller)
+    first.admitted.wait(5)
+    queued = Holder(controller)
+    wait_for(lambda: controller.queue_depth() == 1)
+
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        controller._acquire(False)
+    assert rejected.value.retry_after >= 1
+    assert controller.counters['shed'] == 1
+    first.finish()
+    queued.finish()
+
+
+def test_freed_slot_goes_to_the_urgent_lane_first():
+    controller = app.AdmissionController(max_inflight=1, max_queue=2, queue_timeout=5)
+    first = Holder(controller)
+    first.admitted.wait(5)
+    normal = Holder(controller)
+    wait_for(lambda: controller.queue_depth() == 1)
+    urgent = Holder(controller, priority=True)
+    wait_for(lambda: controller.queue_depth() == 2)
+
+    first.finish()
+    assert urgent.admitted.wait(5)
+    assert not normal.admitted.is_set()
+    urgent.finish()
+    assert normal.admitted.wait(5)
+    normal.finish()
+
+
+def test_urgent_takes_the_place_of_the_newest_normal_waiter():
+    controller = app.AdmissionController(max_inflight=1, max_queue=1, queue_timeout=5)
+    first = Holder(controller)
+    first.admitted.wait(5)
+    urgent = Holder(controller, priority=True)
+    wait_for(lambda: controller.queue_depth() == 1)
+    normal = Holder(controller)
+    wait_for(lambda: controller.queue_depth() == 2)
+
+    late = Holder(controller, priority=True)  # Urgent lane is full
+    normal.thread.join(5)
+    assert isinstance(normal.error, app.AdmissionRejected)
+    assert controller.counters['displaced'] == 1 and controller.counters['shed'] == 1
+    assert controller.counters['priority_shed'] == 0
+
+    for holder in (first, urgent, late):
+        assert holder.admitted.wait(5)
+        holder.finish()
+    assert controller.inflight == 0 and controller.queue_depth() == 0
+
+
+def test_urgent_is_shed_when_no_normal_waiter_can_give_way():
+    controller = app.AdmissionController(max_inflight=1, max_queue=1, queue_timeout=5)
+    first = Holder(controller)
+    first.admitted.wait(5)
+    urgent = Holder(controller, priority=True)
+    wait_for(lambda: controller.queue_depth() == 1)
+
+    with pytest.raises(app.AdmissionRejected):
+        controller._acquire(True)
+    assert controller.counters['priority_shed'] == 1
+    first.finish()
+    urgent.finish()
+
+
+def test_queue_timeout_sheds_and_leaves_the_lane():
+    controller = app.AdmissionController(max_inflight=1, max_queue=1, queue_timeout=0.05)
+    first = Holder(controller)
+    first.admitted.wait(5)
+    waiter = Holder(controller)
+    waiter.thread.join(5)
+
+    assert isinstance(waiter.error, app.AdmissionRejected)
+    assert controller.counters['timeouts'] == 1
+    assert controller.queue_depth() == 0
+    first.finish()
+    assert controller.inflight == 0
@@ -0,0 +1,17 @@
+import argparse
+
+import pytest
+
+import bench
+
+
+def test_weights_must_name_generator_categories():
+    assert bench.parse_weights('casual=1, credit_req=3') == {'casual': 1.0, 'credit_req': 3.0}
+    for text in ('casul=70', 'casual=lots', 'casual=-1', 'casual=0'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            bench.parse_weights(text)
+
+
+def test_health_reports_server_memory(client):
+    health = client.get('/health').get_json()
+    assert health['peak_rss_mb'] > 0
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+import app
+
+
+def slow_scan(message):
+    """Pool task: sleeps for 'bad' (runaway) and briefly for 'good' (still running)"""
+    time.sleep(3 if message == 'bad' else 0.3)
+    return {'fields': {}, 'message': message}
+
+
+@pytest.fixture
+def pool():
+    pool = app.ExtractionPool(workers=2, timeout=0.5, min_chars=0, task=slow_scan)
+    yield pool
+    if pool._pool is not None:
+        pool._pool.terminate()
+
+
+def test_runaway_task_times_out(pool):
+    assert pool.scan('bad') is None
+    assert pool.stats()['timeouts'] == 1 and pool.stats()['restarts'] == 1
+
+
+def test_restart_does_not_fail_other_threads_tasks(pool):
+    results = {}
+
+    def scan(message):
+        results[message] = pool.scan(message)
+
+    bad = threading.Thread(target=scan, args=('bad',))
+    bad.start()
+    # Submitted while 'bad' runs, still running when the pool is killed
+    time.sleep(0.35)
+    good = threading.Thread(target=scan, args=('good',))
+    good.start()
+    bad.join()
+    good.join()
+
+    assert results['bad'] is None
+    assert results['good'] == {'fields': {}, 'message': 'good'}
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_pool_scans_in_clean_worker_processes():
+    pool = app.ExtractionPool(workers=1, min_chars=0)
+    try:
+        scan = pool.scan("Name: Dana Levi phone 054-123-4567")
+        assert scan['fields']
+        assert pool._pool._ctx.get_start_method() != 'fork'
+    finally:
+        pool._pool.terminate()
@@ -0,0 +1,68 @@
+import json
+
+import app
+
+
+def worker_hub(tmp_path):
+    """A FeedHub as one worker process would build it on the shared backend"""
+    return app.FeedHub(log=app.FeedLog(str(tmp_path / 'feed.db')), poll_interval=0.02)
+
+
+def test_events_reach_viewers_on_other_workers(tmp_path):
+    first, second = worker_hub(tmp_path), worker_hub(tmp_path)
+    everything = second.subscribe()
+    other_group = second.subscribe('north')
+    try:
+        first.publish({'group': app.DEFAULT_GROUP, 'message': 'from worker one'})
+        event = json.loads(everything.queue.get(timeout=2))
+        assert event['message'] == 'from worker one'
+        assert other_group.queue.empty()
+    finally:
+        second.unsubscribe(everything)
+        second.unsubscribe(other_group)
+
+
+def test_viewers_on_any_worker_count_as_watching(tmp_path):
+    first, second = worker_hub(tmp_path), worker_hub(tmp_path)
+    assert not first.wait_for_subscribers(timeout=0)
+    subscriber = second.subscribe()
+    try:
+        assert first.wait_for_subscribers(timeout=2)
+    finally:
+        second.unsubscribe(subscriber)
+
+
+def test_only_one_worker_generates_chat(tmp_path):
+    lock_path = str(tmp_path / 'broker-feed.lock')
+    hub = worker_hub(tmp_path)
+    first = app.BrokerFeed(hub, app.BrokerChatGenerator(seed=1), lock_path=lock_path)
+    second = app.BrokerFeed(hub, app.BrokerChatGenerator(seed=2), lock_path=lock_path)
+    assert first.leads()
+    assert first.leads()
+    assert not second.leads()
+
+    first._lock_file.close()  # The leader's process exits
+    assert second.leads()
+
+
+def test_memory_backend_delivers_in_process():
+    hub = app.FeedHub()
+    subscriber = hub.subscribe()
+    hub.publish({'group': app.DEFAULT_GROUP, 'message': 'local'})
+    assert json.loads(subscriber.queue.get_nowait())['message'] == 'local'
+    hub.unsubscribe(subscriber)
+
+
+def test_viewers_past_the_cap_are_refused(monkeypatch, client):
+    hub = app.FeedHub(max_subscribers=2)
+    monkeypatch.setattr(app, 'feed_hub', hub)
+    monkeypatch.setattr(app.broker_feed, 'ensure_running', lambda: None)
+    held = [hub.subscribe(), hub.subscribe()]
+
+    response = client.get('/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert hub.stats()['refused_subscribers'] == 1
+
+    hub.unsubscribe(held.pop())
+    assert hub.subscribe() is not None
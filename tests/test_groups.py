@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def shared_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'STATE_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'STATE_BACKEND', 'shared')
+    return tmp_path
+
+
+def worker():
+    """A registry as one gunicorn worker would hold it"""
+    default = app.GroupState(app.DEFAULT_GROUP, app.LocalCounters(), app.TenantStore())
+    return app.GroupRegistry(app.create_group, default)
+
+
+def add_record(group, name):
+    group.store.add('hi', 'Sarah_TLV', {'tenant': {'name': name, 'phone': '050-123-4567'}, 'extracted_count': 2})
+
+
+def test_evict_leaves_files_for_other_workers(shared_state):
+    first, second = worker(), worker()
+    add_record(first.get('north'), 'Dana Levi')
+    held = second.get('north')
+    assert len(held.store) == 1
+
+    assert first.evict('north')
+    assert os.path.exists(os.path.join(held.path, 'records.db'))
+    assert len(held.store) == 1  # Still readable by the worker that had it open
+
+
+def test_other_workers_drop_a_tombstoned_group(shared_state):
+    first, second = worker(), worker()
+    add_record(first.get('north'), 'Dana Levi')
+    second.get('north')
+    first.evict('north')
+
+    assert second.get('north', create=False) is None
+    fresh = second.get('north')
+    assert len(fresh.store) == 0
+    assert fresh.path != app.group_dir('north')
+
+
+def test_deleted_group_is_not_found(shared_state, monkeypatch, client):
+    monkeypatch.setattr(app, 'groups', worker())
+    add_record(app.groups.get('south'), 'Avi Cohen')
+
+    assert client.delete('/groups/south').status_code == 200
+    assert client.get('/groups/south').status_code == 404
+    assert client.delete('/groups/south').status_code == 404
+
+
+def test_reaper_removes_tombstoned_files_after_grace(shared_state):
+    first = worker()
+    add_record(first.get('north'), 'Dana Levi')
+    old = first.get('north').path
+    first.evict('north')
+    first.get('north')  # Next generation is live
+
+    assert app.reap_tombstones(grace=60) == 0
+    assert os.path.exists(os.path.join(old, 'records.db'))
+
+    assert app.reap_tombstones(grace=0) == 1
+    assert sorted(os.listdir(old)) == ['TOMBSTONE', 'gen-1']
+    assert not os.path.exists(os.path.join(old, 'records.db'))
+    assert app.live_group_dir('north') == app.group_dir('north', 1)
+    assert os.path.exists(os.path.join(app.group_dir('north', 1), 'records.db'))
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def timed_out_pool(monkeypatch):
+    """Extraction pool whose every scan runs past its time limit"""
+    class TimedOutPool:
+        def wants(self, message):
+            return True
+
+        def scan(self, message):
+            return None
+
+        def scan_many(self, messages):
+            return [None] * len(messages)
+
+    monkeypatch.setattr(app, 'extraction_pool', TimedOutPool())
+
+
+HUGE = "x" * (app.message_guard.reject_chars + 1)
+
+
+def test_process_rejects_oversized_message(client):
+    response = client.post('/process', json={'message': HUGE, 'sender': 'Dana'})
+    assert response.status_code == 200
+    assert response.get_json()['status'].startswith('REJECTED')
+    assert response.get_json()['duplicate_of'] is None
+
+
+def test_batch_rejects_oversized_message(client):
+    response = client.post('/process/batch', json={'messages': [{'message': HUGE}, {'message': 'hi'}]})
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['status'].startswith('REJECTED')
+
+
+def test_ingest_skips_oversized_line(client):
+    lines = [json.dumps({'sender': 'Dana', 'message': HUGE}),
+             json.dumps({'sender': 'Avi', 'message': 'Name: Dan Levi phone 052-1234567 salary 9,000'})]
+    response = client.post('/ingest?format=ndjson', data="\n".join(lines))
+    progress = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert progress[-1]['done'] and progress[-1]['messages'] == 2
+
+
+def test_timed_out_scan_on_every_endpoint(client, timed_out_pool):
+    response = client.post('/process', json={'message': 'screen tenant please', 'sender': 'Dana'})
+    assert response.status_code == 200
+    assert response.get_json()['status'].startswith('SKIPPED')
+
+    response = client.post('/process/batch', json={'messages': [{'message': 'screen tenant please'}]})
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['status'].startswith('SKIPPED')
+
+    response = client.post('/ingest?format=ndjson', data=json.dumps({'sender': 'Dana', 'message': 'hello'}))
+    assert json.loads(response.get_data(as_text=True).splitlines()[-1])['messages'] == 1
+
+
+def test_history_and_feed_keep_guarded_size(client):
+    subscriber = app.feed_hub.subscribe('guard-tests')
+    try:
+        client.post('/process', json={'message': HUGE, 'sender': 'Dana', 'group': 'guard-tests'})
+        event = json.loads(subscriber.queue.get_nowait())
+    finally:
+        app.feed_hub.unsubscribe(subscriber)
+    history = client.get('/groups/guard-tests/history').get_json()['messages']
+    assert len(history[-1]['message']) == app.message_guard.max_chars
+    assert len(event['message']) == app.message_guard.max_chars
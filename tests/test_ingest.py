@@ -0,0 +1,97 @@
+import json
+import subprocess
+import sys
+
+import app
+
+
+def parse(text, fmt='auto'):
+    return list(app.parse_chat_lines(text.splitlines(), fmt))
+
+
+def test_ios_and_android_timestamps():
+    text = "\n".join([
+        "[16/10/2026, 09:15:02] Sarah_TLV: Good morning",
+        "16/10/2026, 09:16 - Avi_RG: Morning!",
+        "10/16/26, 9:17 PM - Maya Herz: Any tenants?",
+        "[16.10.2026, 21:18:00] David_Rental: Not yet",
+    ])
+    assert parse(text) == [
+        ('Sarah_TLV', 'Good morning'),
+        ('Avi_RG', 'Morning!'),
+        ('Maya Herz', 'Any tenants?'),
+        ('David_Rental', 'Not yet'),
+    ]
+
+
+def test_continuation_lines_join_the_previous_message():
+    text = "\n".join([
+        "[16/10/2026, 09:15:02] Sarah_TLV: New application:",
+        "Name: Dana Levi",
+        "Phone: 054-123-4567",
+        "[16/10/2026, 09:16:00] Avi_RG: Thanks",
+    ])
+    assert parse(text) == [
+        ('Sarah_TLV', "New application:\nName: Dana Levi\nPhone: 054-123-4567"),
+        ('Avi_RG', 'Thanks'),
+    ]
+
+
+def test_system_notices_are_skipped_with_their_continuations():
+    text = "\n".join([
+        "16/10/2026, 09:00 - Messages and calls are end-to-end encrypted.",
+        "Tap to learn more.",
+        "16/10/2026, 09:01 - Sarah_TLV created group \"Brokers\"",
+        "16/10/2026, 09:02 - Sarah_TLV: Welcome all",
+    ])
+    assert parse(text) == [('Sarah_TLV', 'Welcome all')]
+
+
+def test_long_messages_are_capped():
+    lines = ["[16/10/2026, 09:15:02] Sarah_TLV: start"] + ["x" * 1000] * 10
+    (_, message), = parse("\n".join(lines))
+    assert len(message) == app.INGEST_MAX_MESSAGE
+
+
+def test_ndjson_lines_and_mixed_input():
+    text = "\n".join([
+        json.dumps({'sender': 'Avi_RG', 'message': 'hello'}),
+        "[16/10/2026, 09:15:02] Sarah_TLV: hi",
+        "more of Sarah's message",
+        json.dumps({'message': 'no sender'}),
+    ])
+    assert parse(text) == [
+        ('Avi_RG', 'hello'),
+        ('Sarah_TLV', "hi\nmore of Sarah's message"),
+        ('Unknown', 'no sender'),
+    ]
+
+
+def test_ndjson_format_ignores_other_lines():
+    text = "\n".join(["[16/10/2026, 09:15:02] Sarah_TLV: hi", "{not json", json.dumps({'message': 'ok'})])
+    assert parse(text, 'ndjson') == [('Unknown', 'ok')]
+
+
+def test_whatsapp_format_does_not_read_json():
+    assert parse('{"message": "hi"}', 'whatsapp') == []
+
+
+def test_ingest_makes_no_reply_calls(monkeypatch):
+    class NoReplies:
+        def generate_many(self, items):
+            raise AssertionError("ingest asked for replies")
+
+    monkeypatch.setattr(app, 'responder', NoReplies())
+    messages = [('Sarah_TLV', "Need urgent credit check, Name: Rina Katz phone 050-111-2233")]
+    last = list(app.ingest_messages(messages, group=app.groups.get('ingest-tests')))[-1]
+    assert last['messages'] == 1 and last['records'] == 1
+
+
+def test_cli_refuses_memory_backend(tmp_path):
+    export = tmp_path / 'chat.txt'
+    export.write_text("[16/10/2026, 09:15:02] Sarah_TLV: hi\n")
+    env = {'STATE_BACKEND': 'memory', 'PATH': '/usr/bin:/bin'}
+    result = subprocess.run([sys.executable, 'app.py', 'ingest', str(export)], env=env,
+                            cwd=app.os.path.dirname(app.__file__), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 2
+    assert 'STATE_BACKEND=shared' in result.stderr
@@ -0,0 +1,194 @@
+import json
+import re
+import threading
+import time
+
+import pytest
+
+import app
+
+
+class FakeReply:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Local stand-in for the Gemini client: canned reply, optional delay or error"""
+
+    def __init__(self, text='', delay=0, error=None, gate=None):
+        self.text = text
+        self.delay = delay
+        self.error = error
+        self.gate = gate
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return FakeReply(self.text(prompt) if callable(self.text) else self.text)
+
+
+def monitor_with(model, workers=2, queue_depth=4, timeout=1.0):
+    monitor = app.WorkingMonitorAgent(app.MessageScanner(), model=model)
+    monitor.gateway = app.ModelGateway(model, workers=workers, queue_depth=queue_depth, timeout=timeout)
+    monitor.batcher = None
+    return monitor
+
+
+APPLICATION = "Name: Dan Levi, phone 052-1234567, salary 15,000"
+
+
+def test_model_decision_is_used():
+    monitor = monitor_with(FakeModel('{"should_respond": false, "confidence": 0.7, "reason": "Chat"}'))
+    decision = monitor.decide(APPLICATION)
+    assert decision == {"should_respond": False, "confidence": 0.7, "reason": "Chat", "source": "model"}
+
+
+def test_timeout_falls_back_to_rules():
+    model = FakeModel('{"should_respond": false}', delay=0.3)
+    monitor = monitor_with(model, timeout=0.05)
+    decision = monitor.decide(APPLICATION)
+    assert decision['source'] == 'rules'
+    assert decision['reason'] == monitor.should_respond(APPLICATION)['reason']
+    assert monitor.gateway.stats()['timeouts'] == 1
+
+
+def test_queue_full_is_rejected_and_falls_back():
+    gate = threading.Event()
+    model = FakeModel('{"should_respond": true}', gate=gate)
+    gateway = app.ModelGateway(model, workers=1, queue_depth=0, timeout=2.0)
+    monitor = monitor_with(model)
+    monitor.gateway = gateway
+
+    blocker = threading.Thread(target=gateway.generate, args=('hold the only slot',))
+    blocker.start()
+    while not model.prompts:
+        time.sleep(0.01)
+    try:
+        with pytest.raises(app.ModelUnavailable):
+            gateway.generate('no room')
+        assert monitor.decide(APPLICATION)['source'] == 'rules'
+        assert gateway.stats()['rejected'] == 2
+    finally:
+        gate.set()
+        blocker.join()
+
+
+@pytest.mark.parametrize('text', ['not json at all', '{"confidence": 0.9}', ''])
+def test_bad_reply_falls_back_to_rules(text):
+    monitor = monitor_with(FakeModel(text))
+    decision = monitor.decide(APPLICATION)
+    assert decision == dict(monitor.should_respond(APPLICATION), source='rules')
+
+
+def test_model_error_falls_back_to_rules():
+    monitor = monitor_with(FakeModel(error=RuntimeError('quota exceeded')))
+    assert monitor.decide(APPLICATION)['source'] == 'rules'
+    assert monitor.gateway.stats()['errors'] == 1
+
+
+def test_fallback_decisions_are_not_cached():
+    model = FakeModel(error=RuntimeError('down'))
+    monitor = monitor_with(model)
+    monitor.cache = app.ResponseCache()
+    monitor.decide(APPLICATION)
+    model.error = None
+    model.text = '{"should_respond": true, "confidence": 0.6, "reason": "Back up"}'
+    assert monitor.decide(APPLICATION)['source'] == 'model'
+
+
+def test_reply_uses_model_text():
+    gateway = app.ModelGateway(FakeModel('  Thanks Dan, checking now!  '), timeout=1.0)
+    responder = app.WorkingResponseAgent(gateway)
+    assert responder.generate(APPLICATION, {'tenant': {'name': 'Dan Levi'}}) == 'Thanks Dan, checking now!'
+
+
+@pytest.mark.parametrize('model', [
+    FakeModel('late', delay=0.3),
+    FakeModel(error=RuntimeError('boom')),
+    FakeModel('   '),
+])
+def test_reply_falls_back_to_templates(model):
+    responder = app.WorkingResponseAgent(app.ModelGateway(model, timeout=0.05))
+    data = {'tenant': {'name': 'Dan Levi', 'salary': '15,000'}}
+    assert responder.generate(APPLICATION, data) == responder.respond(APPLICATION, data)
+
+
+def _verdicts_for(prompt):
+    """Answer a batch prompt with one verdict per numbered message, ids shuffled"""
+    numbered = re.findall(r'^(\d+)\. (.*)$', prompt, re.MULTILINE)
+    verdicts = [{'id': int(i), 'should_respond': 'urgent' in message, 'confidence': 0.9,
+                 'reason': json.loads(message)} for i, message in numbered]
+    return json.dumps(list(reversed(verdicts)))
+
+
+def test_batcher_fans_one_call_out_to_every_caller():
+    model = FakeModel(_verdicts_for)
+    gateway = app.ModelGateway(model, workers=2, timeout=2.0)
+    batcher = app.DecisionBatcher(gateway, window=0.2, max_batch=8)
+    messages = [f"message {i}" + (" urgent" if i % 2 else "") for i in range(6)]
+    results = {}
+
+    def classify(message):
+        results[message] = batcher.classify(message)
+
+    threads = [threading.Thread(target=classify, args=(m,)) for m in messages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(model.prompts) == 1
+    assert batcher.stats()['batches'] == 1 and batcher.stats()['items'] == 6
+    for message in messages:
+        assert results[message]['reason'] == message
+        assert results[message]['should_respond'] == message.endswith('urgent')
+
+
+def test_batcher_failure_reaches_every_caller():
+    gateway = app.ModelGateway(FakeModel('no json here'), timeout=2.0)
+    batcher = app.DecisionBatcher(gateway, window=0.1, max_batch=8)
+    errors = []
+
+    def classify(message):
+        try:
+            batcher.classify(message)
+        except app.ModelUnavailable:
+            errors.append(message)
+
+    threads = [threading.Thread(target=classify, args=(f"m{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(errors) == ['m0', 'm1', 'm2']
+    assert batcher.stats()['failed_batches'] == 1
+
+
+def test_batch_endpoint_shares_model_calls(monkeypatch, client):
+    def answer(prompt):
+        return _verdicts_for(prompt) if prompt.startswith(app.DecisionBatcher.PROMPT[:40]) else 'On it!'
+
+    model = FakeModel(answer, delay=0.05)
+    monitor = monitor_with(model, workers=4, queue_depth=16, timeout=2.0)
+    monitor.batcher = app.DecisionBatcher(monitor.gateway, window=0.01, max_batch=16)
+    monkeypatch.setattr(app, 'monitor', monitor)
+    monkeypatch.setattr(app, 'responder', app.WorkingResponseAgent(monitor.gateway))
+
+    messages = [{'message': f"need urgent check #{i}", 'sender': 'Avi_RG'} for i in range(20)]
+    started = time.monotonic()
+    response = client.post('/process/batch', json={'messages': messages, 'group': 'batch-model'})
+    elapsed = time.monotonic() - started
+
+    results = response.get_json()['results']
+    assert [r['ai_response'] for r in results] == ['On it!'] * 20
+    batch_calls = [p for p in model.prompts if p.startswith(app.DecisionBatcher.PROMPT[:40])]
+    assert len(batch_calls) == 2  # 20 items at max_batch 16
+    assert len(model.prompts) == 22
+    assert elapsed < 1.0  # One call after another would take 2s
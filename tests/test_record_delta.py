@@ -0,0 +1,34 @@
+import app
+
+
+def test_process_caps_record_delta_and_pages_through_data(client):
+    group = app.groups.get('delta-tests')
+    for i in range(app.RECORD_DELTA_LIMIT + 10):
+        group.store.add(f"msg {i}", 'Sarah_TLV', {'tenant': {'phone': f"050-000-{i:04d}"}, 'extracted_count': 1})
+
+    body = client.post('/process', json={'message': 'hi', 'group': 'delta-tests', 'since': 0}).get_json()
+    assert len(body['records']) == app.RECORD_DELTA_LIMIT
+    assert body['more'] is True
+    assert body['next_cursor'] == body['records'][-1]['id']
+
+    rest = client.get('/data', query_string={'group': 'delta-tests', 'after': body['next_cursor']}).get_json()
+    assert len(rest['records']) == 10
+
+    caught_up = client.post('/process', json={'message': 'hi', 'group': 'delta-tests', 'since': body['cursor']}).get_json()
+    assert caught_up['more'] is False
+    assert caught_up['next_cursor'] is None
+
+
+def test_merged_duplicate_comes_back_with_the_reply(client):
+    first = client.post('/process', json={
+        'message': "Name: Yael Mizrahi phone 054-765-4321 salary 14000", 'sender': 'Maya_Herz', 'group': 'merge-tests'
+    }).get_json()
+    record_id = first['records'][-1]['id']
+
+    repeat = client.post('/process', json={
+        'message': "Name: Yael Mizrahi phone 054-765-4321 salary 16000", 'sender': 'Avi_RG',
+        'group': 'merge-tests', 'since': first['cursor']
+    }).get_json()
+    assert repeat['duplicate_of'] == record_id
+    assert [record['id'] for record in repeat['records']] == [record_id]
+    assert repeat['records'][0]['data']['senders'] == ['Maya_Herz', 'Avi_RG']
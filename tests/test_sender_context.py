@@ -0,0 +1,35 @@
+import pytest
+
+import app
+
+
+def post(client, message, **body):
+    response = client.post('/process', json=dict(body, message=message, group='context-tests'))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_split_application_from_one_sender_is_merged(client):
+    post(client, "my name: Rina Katz", sender='Moshe_Homes')
+    result = post(client, "her phone 03-555-12345", sender='Moshe_Homes')
+    assert result['status'].startswith('RESPONDED: Complete tenant data (split messages)')
+
+
+def test_dashboard_tabs_are_not_merged(client):
+    post(client, "my name: Yosef Amar", sender='You', client_id='tab-a')
+    result = post(client, "our office phone 03-555-99999", sender='You', client_id='tab-b')
+    assert result['status'].startswith('IGNORED')
+
+
+@pytest.mark.parametrize('sender', ['You', 'Unknown', None])
+def test_placeholder_senders_are_not_merged(client, sender):
+    body = {} if sender is None else {'sender': sender}
+    post(client, "my name: Lior Ben David", **body)
+    assert post(client, "office phone 04-555-77777", **body)['status'].startswith('IGNORED')
+
+
+@pytest.mark.parametrize('sender', [['Avi'], {'name': 'Avi'}, 42])
+def test_non_string_sender(client, sender):
+    post(client, "my name: Noa Levin", sender=sender)
+    response = client.post('/process/batch', json={'messages': [{'message': 'hi', 'sender': sender}]})
+    assert response.status_code == 200
@@ -0,0 +1,18 @@
+import app
+
+
+def test_gzip_is_served_when_accepted(client):
+    response = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_gzip_refused_with_zero_quality(client):
+    response = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert b'function' in response.data
+
+
+def test_weak_etag_revalidates(client):
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'W/{etag}'})
+    assert response.status_code == 304
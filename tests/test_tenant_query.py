@@ -0,0 +1,15 @@
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-Infinity', '1e400'])
+def test_non_finite_times_are_rejected(client, value):
+    response = client.get('/tenants', query_string={'since': value})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('value', ['1700000000', '2024-01-01T00:00:00'])
+def test_epoch_and_iso_times_are_accepted(client, value):
+    response = client.get('/tenants', query_string={'until': value})
+    assert response.status_code == 200
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import threading
+
+import app
+
+
+def old_database(path, tenant):
+    """A records.db as written before normalize_field keyed the columns"""
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, timestamp TEXT NOT NULL,
+        sender TEXT, message TEXT, data TEXT, name TEXT, phone TEXT, email TEXT, salary INTEGER
+    )""")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT INTO meta VALUES ('evicted', 0)")
+    conn.execute(
+        "INSERT INTO records (created, timestamp, sender, message, data, name, phone, email, salary) "
+        "VALUES (0, '2024-01-01T00:00:00', 'Sarah_TLV', 'msg', ?, ?, ?, ?, NULL)",
+        (json.dumps({'tenant': tenant, 'extracted_count': len(tenant)}),
+         *(str(tenant[field]).lower() if field in tenant else None for field in ('name', 'phone', 'email')))
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_old_database_keys_are_renormalized(tmp_path):
+    path = str(tmp_path / 'records.db')
+    old_database(path, {'name': 'Dana Levi', 'phone': '054-123-4567'})
+
+    store = app.SQLiteTenantStore(path)
+    assert store.find_duplicate({'phone': '+972 54 123 4567'})['id'] == 1
+    assert store.find_duplicate({'name': 'Levi Dana'})['id'] == 1
+    assert [r['id'] for r in store.lookup('phone', '0541234567')] == [1]
+    assert store.find_duplicate({'name': 'Dena Levi'})['id'] == 1
+
+
+def test_renormalizing_runs_once(tmp_path):
+    path = str(tmp_path / 'records.db')
+    old_database(path, {'phone': '054-123-4567'})
+    app.SQLiteTenantStore(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE records SET phone = 'manual'")
+    conn.commit()
+    conn.close()
+    app.SQLiteTenantStore(path)
+    assert sqlite3.connect(path).execute("SELECT phone FROM records").fetchone()[0] == 'manual'
+
+
+def stores(tmp_path):
+    return [app.TenantStore(), app.SQLiteTenantStore(str(tmp_path / 'fuzzy.db'))]
+
+
+def add(store, **tenant):
+    return store.add('msg', 'Sarah_TLV', {'tenant': tenant, 'extracted_count': len(tenant)})
+
+
+def test_first_name_typo_matches_same_last_name(tmp_path):
+    for store in stores(tmp_path):
+        record = add(store, name='Daniel Levi', salary='15,000')
+        for typo in ('Danel Levi', 'Danial Levi', 'Daniell Levi'):
+            assert store.find_duplicate({'name': typo})['id'] == record['id']
+
+
+def test_fuzzy_name_needs_same_last_name_and_no_conflict(tmp_path):
+    for store in stores(tmp_path):
+        add(store, name='Daniel Levi', phone='054-123-4567')
+        assert store.find_duplicate({'name': 'Daniel Levy'}) is None
+        assert store.find_duplicate({'name': 'Danny Levi'}) is None
+        assert store.find_duplicate({'name': 'Danel Levi', 'phone': '052-999-0000'}) is None
+
+
+def test_short_first_names_match_exactly(tmp_path):
+    for store in stores(tmp_path):
+        add(store, name='Dan Cohen')
+        assert store.find_duplicate({'name': 'Don Cohen'}) is None
+        assert store.find_duplicate({'name': 'Dan Cohen'}) is not None
+
+
+def test_exact_name_wins_over_fuzzy(tmp_path):
+    for store in stores(tmp_path):
+        exact = add(store, name='Maria Katz')
+        add(store, name='Marie Katz')
+        assert store.find_duplicate({'name': 'Maria Katz'})['id'] == exact['id']
+
+
+def test_sqlite_store_shares_one_connection_across_threads(tmp_path):
+    store = app.SQLiteTenantStore(str(tmp_path / 'shared.db'))
+    add(store, name='Dana Levi')
+    release = threading.Event()
+    ready = threading.Barrier(17)
+
+    def request_thread():
+        assert len(store.since(0)) == 1
+        ready.wait()
+        release.wait(5)  # Stay alive like a gthread worker thread
+
+    threads = [threading.Thread(target=request_thread) for _ in range(16)]
+    before = len(os.listdir('/proc/self/fd'))
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    opened = len(os.listdir('/proc/self/fd')) - before
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert opened <= 3  # The database and its WAL/shm, not one set per thread